@@ -0,0 +1,139 @@
+"""server_analytics (server_id, created_at) index and optional partitioning
+
+Revision ID: 23d949ee39ac
+Revises: a332ede8ae71
+Create Date: 2026-10-18 09:12:40.118233
+
+Pass -x partitioning=daily|monthly to also convert server_analytics into a
+table range-partitioned on created_at (and set ANALYTICS_PARTITIONING to the same
+value, so the worker maintains the partitions):
+
+    alembic -x partitioning=daily upgrade head
+
+Existing rows are copied into the new partitions. Everything this migration needs
+is defined here, so the schema it produces doesn't depend on the app's settings.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '23d949ee39ac'
+down_revision: Union[str, Sequence[str], None] = 'a332ede8ae71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GRANULARITIES = ("daily", "monthly")
+DEFAULT_PARTITION = "server_analytics_default"
+PARTITIONS_AHEAD = 3
+
+
+def period_start(day: date, granularity: str) -> date:
+    return day if granularity == "daily" else day.replace(day=1)
+
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "daily":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def create_partitions(granularity: str, first: date, last: date) -> None:
+    start = period_start(first, granularity)
+    while start <= last:
+        end = next_period(start, granularity)
+        suffix = start.strftime("%Y%m%d") if granularity == "daily" else start.strftime("%Y%m")
+        op.execute(
+            f"CREATE TABLE server_analytics_p{suffix} PARTITION OF server_analytics "
+            f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+        )
+        start = end
+
+
+def create_indexes() -> None:
+    op.create_index(
+        'ix_server_analytics_server_id_created_at',
+        'server_analytics',
+        ['server_id', sa.text('created_at DESC')],
+        unique=False,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    granularity = context.get_x_argument(as_dictionary=True).get("partitioning", "")
+    if granularity not in GRANULARITIES:
+        if granularity:
+            raise ValueError(f"partitioning must be one of {', '.join(GRANULARITIES)}")
+        create_indexes()
+        return
+
+    conn = op.get_bind()
+    op.execute("ALTER TABLE server_analytics RENAME TO server_analytics_unpartitioned")
+    op.execute("""
+        CREATE TABLE server_analytics (
+            id INTEGER NOT NULL DEFAULT nextval('server_analytics_id_seq'),
+            server_id INTEGER,
+            status_code INTEGER,
+            latency_ms DOUBLE PRECISION,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # keep the id sequence alive when the old table is dropped
+    op.execute("ALTER SEQUENCE server_analytics_id_seq OWNED BY server_analytics.id")
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF server_analytics DEFAULT")
+
+    oldest = conn.execute(sa.text("SELECT min(created_at) FROM server_analytics_unpartitioned")).scalar()
+    today = datetime.now(timezone.utc).date()
+    last = today
+    for _ in range(PARTITIONS_AHEAD):
+        last = next_period(period_start(last, granularity), granularity)
+    create_partitions(granularity, oldest.date() if oldest else today, last)
+
+    op.execute("""
+        INSERT INTO server_analytics (id, server_id, status_code, latency_ms, created_at)
+        SELECT id, server_id, status_code, latency_ms, COALESCE(created_at, now())
+        FROM server_analytics_unpartitioned
+    """)
+    op.execute("DROP TABLE server_analytics_unpartitioned")
+    op.create_foreign_key(None, 'server_analytics', 'user_servers', ['server_id'], ['id'], ondelete='CASCADE')
+
+    # the partition key has to be part of the primary key
+    op.execute("ALTER TABLE server_analytics ADD PRIMARY KEY (id, created_at)")
+    op.create_index(op.f('ix_server_analytics_id'), 'server_analytics', ['id'], unique=False)
+    create_indexes()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    partitioned = conn.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'server_analytics')"
+    )).scalar()
+    if not partitioned:
+        op.drop_index('ix_server_analytics_server_id_created_at', table_name='server_analytics')
+        return
+
+    op.execute("ALTER TABLE server_analytics RENAME TO server_analytics_partitioned")
+    op.execute("""
+        CREATE TABLE server_analytics (
+            id INTEGER NOT NULL DEFAULT nextval('server_analytics_id_seq'),
+            server_id INTEGER,
+            status_code INTEGER,
+            latency_ms DOUBLE PRECISION,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("ALTER SEQUENCE server_analytics_id_seq OWNED BY server_analytics.id")
+    op.execute("""
+        INSERT INTO server_analytics (id, server_id, status_code, latency_ms, created_at)
+        SELECT id, server_id, status_code, latency_ms, created_at FROM server_analytics_partitioned
+    """)
+    op.execute("DROP TABLE server_analytics_partitioned")
+    op.create_foreign_key(None, 'server_analytics', 'user_servers', ['server_id'], ['id'], ondelete='CASCADE')
+    op.execute("ALTER TABLE server_analytics ADD PRIMARY KEY (id)")
+    op.create_index(op.f('ix_server_analytics_id'), 'server_analytics', ['id'], unique=False)
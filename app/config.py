@@ -14,7 +14,107 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     ENVIRONMENT: str
-    
+
+    # Database connection pools (applied to both the sync and the async engine)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+
+    # Pinger HTTP client
+    PING_TIMEOUT_SECONDS: float = 10.0
+    HTTP_MAX_CONNECTIONS: int = 500
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = False  # needs the optional 'h2' package
+    DNS_CACHE_TTL_SECONDS: int = 300
+    # "warm" = latency over reused connections, "cold" = full DNS + TCP + TLS handshake per check
+    PING_LATENCY_MODE: str = "warm"
+    PING_MAX_BODY_BYTES: int = 65536  # "get" checks stop reading the body after this much
+
+    # Monitoring scheduler
+    WORKER_CONCURRENCY: int = 100  # checks running at the same time
+    SCHEDULER_JITTER: float = 1.0  # fraction of the interval used to phase-shift each monitor
+    SCHEDULER_LATE_THRESHOLD_SECONDS: float = 1.0
+    # on (re)start monitors resume from their last check; overdue ones are spread over this long
+    STARTUP_RAMP_SECONDS: float = 30.0
+
+    # Argon2 password hashing, run on a dedicated thread pool; changing the cost rehashes on next login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 16  # beyond workers + this, logins get an immediate 503
+
+    # Signed-in users cached per token, so authenticated requests skip the users query
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
+    # Monitoring workers: run embedded in every web process, or separately with python -m servers.worker
+    EMBEDDED_WORKER: bool = True
+    WORKER_ID: str = ""  # defaults to hostname-pid-random
+    WORKER_HEARTBEAT_SECONDS: float = 5.0
+    WORKER_TTL_SECONDS: float = 15.0  # a worker silent this long is dead and its monitors move
+
+    # Adaptive monitors: back off while stable, probe known-down targets with a short timeout
+    ADAPTIVE_STABLE_CHECKS: int = 10  # same-state checks before the interval starts growing
+    PING_DOWN_TIMEOUT_SECONDS: float = 2.0
+    ADAPTIVE_FULL_PROBE_EVERY: int = 5  # every Nth probe of a down target uses the full timeout
+
+    # Monitors on the same URL share one probe; results are reused for this long
+    COALESCE_WINDOW_SECONDS: float = 5.0
+    HOST_MAX_CONCURRENCY: int = 10  # probes running against one host at a time
+
+    # Status-change alerts to the users' webhook destinations, sent by the worker
+    ALERT_BATCH_SECONDS: float = 2.0  # alerts firing within this window go out together
+    ALERT_MAX_BATCH: int = 100  # alerts per webhook request
+    ALERT_RATE_PER_MINUTE: float = 6.0  # requests per destination; alerts merge while waiting
+    ALERT_MAX_ATTEMPTS: int = 5  # then the delivery goes to alert_dead_letters
+    ALERT_RETRY_BASE_SECONDS: float = 2.0  # doubled after every failed attempt
+    ALERT_TIMEOUT_SECONDS: float = 10.0
+    ALERT_QUEUE_SIZE: int = 10000
+
+    # Monitor registry fallback sync (LISTEN/NOTIFY delivers changes immediately)
+    MONITOR_SYNC_SECONDS: float = 30.0  # updated_at > watermark delta query
+    MONITOR_RECONCILE_SECONDS: float = 300.0  # id-only scan to catch missed deletes
+
+    # Batched analytics writes
+    ANALYTICS_BATCH_SIZE: int = 500
+    ANALYTICS_FLUSH_SECONDS: float = 1.0
+    ANALYTICS_QUEUE_SIZE: int = 10000  # submit() waits once this many results are pending
+
+    # server_analytics partitioning: "" (off), "daily" or "monthly"; must match the
+    # -x partitioning=... the server_analytics index migration was run with
+    ANALYTICS_PARTITIONING: str = ""
+    ANALYTICS_PARTITIONS_AHEAD: int = 3
+    ANALYTICS_RETENTION_DAYS: int = 0  # 0 keeps everything; otherwise old partitions are dropped
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 2  # hour and day rollups are kept forever
+
+    # In-memory ring buffer of recent checks per monitor
+    RECENT_CHECKS_DEPTH: int = 100
+
+    # Bulk monitor import (POST /servers/bulk)
+    BULK_IMPORT_MAX_ROWS: int = 10000
+    BULK_IMPORT_BATCH_SIZE: int = 500  # rows per transaction
+
+    # Analytics export: rows fetched per server-side cursor round trip
+    EXPORT_CHUNK_ROWS: int = 5000
+
+    # Dashboard data (latest check, 24h uptime, sparkline) cached per user
+    DASHBOARD_CACHE_SECONDS: float = 5.0
+
+    # Live WebSocket updates
+    WS_SEND_QUEUE_SIZE: int = 32  # per connection; oldest messages are dropped beyond this
+    WS_SEND_TIMEOUT_SECONDS: float = 5.0  # slower sends evict the connection
+    WS_BATCH_MILLISECONDS: int = 250  # dashboard sockets get at most one frame per this long
+    # How results reach viewers in other processes: "memory" (single process), "postgres" or "broker"
+    BROADCAST_BACKEND: str = "memory"
+    BROADCAST_BROKER_HOST: str = "127.0.0.1"  # python -m servers.broker
+    BROADCAST_BROKER_PORT: int = 7700
+
+    # Prometheus metrics: GET /metrics on the web app; standalone workers listen on their own port
+    METRICS_TOKEN: str = ""  # when set, scrapes must send "Authorization: Bearer <token>"
+    WORKER_METRICS_PORT: int = 0  # 0 = off
+
     # We build the URL using the service name 'db' from docker-compose
     @property
     def DATABASE_URL(self) -> str:
@@ -22,6 +122,13 @@ class Settings(BaseSettings):
             return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}"
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}?sslmode=require&channel_binding=require"
 
+    # Same database through the asyncpg driver, used by AsyncSession
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        if self.POSTGRES_HOST == "db:5432":
+            return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}"
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}?ssl=require"
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
@@ -1,11 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
+from .metrics import Callback
 
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for request handlers and the worker, so queries don't block the event loop
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+)
+# expire_on_commit=False keeps loaded attributes usable in templates after a commit
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _pool_stats(stat: str) -> dict:
+    return {("sync",): getattr(engine.pool, stat)(), ("async",): getattr(async_engine.pool, stat)()}
+
+
+Callback("pulse_db_pool_checked_out", "Connections in use", "gauge", lambda: _pool_stats("checkedout"), ("engine",))
+Callback("pulse_db_pool_idle", "Idle connections in the pool", "gauge", lambda: _pool_stats("checkedin"), ("engine",))
+Callback("pulse_db_pool_overflow", "Connections opened beyond pool_size (negative while the pool isn't full)", "gauge", lambda: _pool_stats("overflow"), ("engine",))
+
 # Dependency to get a DB session for each request
 def get_db():
     db = SessionLocal()
@@ -13,3 +39,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async variant of get_db
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
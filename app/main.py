@@ -1,18 +1,24 @@
 import asyncio
 from .config import settings
 from .database import engine, Base
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Depends, HTTPException
 from contextlib import asynccontextmanager
-from sqlalchemy.orm import Session
-from fastapi.responses import RedirectResponse
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from .config import templates
-from .database import get_db
-from .security import get_current_user_from_cookie
+from .database import get_async_db
+from .security import CachedUser, current_user
+from .metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
 from users.api.endpoints import auth
 from servers.apis import api
 from users import models
-from servers.models import UserServer
+from servers.dashboard import dashboard_cache, sparkline_points
 from servers.worker import monitoring_loop
+from servers.http_client import start_http_client, close_http_client
+from servers.alerts import alert_dispatcher
+from servers.analytics_writer import analytics_writer
+from servers.websocket_manager import manager
 from fastapi.middleware.cors import CORSMiddleware
 
 
@@ -26,11 +32,29 @@ if settings.ENVIRONMENT == "production":
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # STARTUP: Run the monitoring loop in the background
-    worker_task = asyncio.create_task(monitoring_loop())
+    # STARTUP: Open the broadcast backend for live updates. Unless the monitors are checked by
+    # separate workers (python -m servers.worker), also open the shared pinger HTTP client,
+    # analytics writer and alert dispatcher and run the monitoring loop in the background
+    await manager.start()
+    worker_task = None
+    if settings.EMBEDDED_WORKER:
+        await start_http_client()
+        analytics_writer.start()
+        alert_dispatcher.start()
+        worker_task = asyncio.create_task(monitoring_loop())
     yield
     # SHUTDOWN: Clean up
-    worker_task.cancel()
+    if worker_task is not None:
+        worker_task.cancel()
+        try:
+            await worker_task
+        except asyncio.CancelledError:
+            pass
+        # flush queued analytics before the process exits
+        await analytics_writer.stop()
+        await alert_dispatcher.stop()
+        await close_http_client()
+    await manager.stop()
 
 app = FastAPI(title="PulseAPI", version="1.0.0", lifespan=lifespan)
 
@@ -42,6 +66,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 # Include all our organized routes
 app.include_router(auth.router)
 app.include_router(api.router)
@@ -56,6 +82,13 @@ async def add_no_cache_header(request: Request, call_next):
     return response
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 async def root(request: Request):
     token = request.cookies.get("access_token")
@@ -75,26 +108,31 @@ async def signin_page(request: Request):
 
 
 @app.get("/dashboard")
-async def dashboard(request: Request, db: Session = Depends(get_db)):
+async def dashboard(request: Request, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
 
-    email = get_current_user_from_cookie(request)
-    if not email:
+    if not user:
         # Redirect to login if token is missing or invalid
         return RedirectResponse(url="/signin?error=Please login first", status_code=303)
 
-    user = db.query(models.User).filter(models.User.email == email).first()
-    sites = db.query(UserServer).filter(UserServer.user_id == user.id).all()
+    sites = await dashboard_cache.get(db, user.id)
 
     return templates.TemplateResponse(
         "dashboard.html", 
-        {"request": request, "user": user, "sites": sites}
+        {"request": request, "user": user, "sites": sites, "sparkline_points": sparkline_points}
     )
 
 
+@app.get("/dashboard/data")
+async def dashboard_data(db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Same data as the dashboard as JSON, for the UI to poll."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return {"sites": await dashboard_cache.get(db, user.id)}
+
+
 @app.get("/create-server")
-async def create_server_page(request: Request, db: Session = Depends(get_db)):
-    email = get_current_user_from_cookie(request)
-    if not email:
+async def create_server_page(request: Request, user: Optional[CachedUser] = Depends(current_user)):
+    if not user:
         # Redirect to login if token is missing or invalid
         return RedirectResponse(url="/signin?error=Please login first", status_code=303)
     return templates.TemplateResponse("create_server.html", {"request": request})
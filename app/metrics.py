@@ -0,0 +1,235 @@
+"""
+Prometheus text-format metrics without extra dependencies.
+
+Metrics are module-level objects created at import time. Updating one is a plain attribute
+or list-slot increment: everything runs on the event loop, so there are no locks, and
+histogram buckets are preallocated per label set. Figures components already keep in
+their own stats dicts are read at scrape time through callbacks instead of being counted
+twice. The web app serves them on /metrics; a standalone worker can serve them itself with
+serve() (WORKER_METRICS_PORT).
+"""
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENESS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY: List["_Metric"] = []
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in list(self._children.items()):
+            yield from self._child_samples(tuple(zip(self.labelnames, values)), child)
+
+    def _child_samples(self, labels, child) -> Iterable[Sample]:
+        yield self.name, labels, child.value
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.value += amount
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self._default.value -= amount
+
+    def set(self, value: float):
+        self._default.value = value
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _child_samples(self, labels, child) -> Iterable[Sample]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+        yield f"{self.name}_sum", labels, child.sum
+        yield f"{self.name}_count", labels, child.count
+
+
+class Callback(_Metric):
+    """
+    Read at scrape time: fn() returns a number, or with labelnames a {label values: number}
+    dict. For figures a component already tracks, e.g. a queue size or a stats dict entry.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Union[float, Dict[tuple, float]]], labelnames: Sequence[str] = ()):
+        self.kind = kind
+        self.fn = fn
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def samples(self) -> Iterable[Sample]:
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e!r}")
+            return
+        if not self.labelnames:
+            yield self.name, (), value
+            return
+        for values, v in value.items():
+            yield self.name, tuple(zip(self.labelnames, values)), v
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "pulse_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests per route template (not per concrete path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], path, f"{status // 100}xx").observe(time.perf_counter() - started)
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    """Minimal HTTP listener answering every request with the metrics, for processes without the web app."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            body = render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                + f"Content-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from .config import settings
+
+
+class HashingPoolBusy(Exception):
+    """Every hashing slot is taken; callers should answer 503 rather than queue."""
+
+
+class PasswordPool:
+    """
+    Runs Argon2 hash/verify on a small dedicated thread pool so a burst of logins can't stall
+    the event loop (argon2-cffi releases the GIL while hashing, so the threads run in
+    parallel). At most `workers + max_pending` operations are admitted at once; the rest are
+    refused immediately with HashingPoolBusy.
+    """
+
+    def __init__(self, hasher: PasswordHasher, workers: int, max_pending: int):
+        self.hasher = hasher
+        self.capacity = workers + max_pending
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self.stats = {"hashed": 0, "verified": 0, "rejected": 0}
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            self.stats["rejected"] += 1
+            raise HashingPoolBusy()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(self.hasher.hash, password)
+        self.stats["hashed"] += 1
+        return hashed
+
+    async def verify(self, hashed: str, password: str) -> bool:
+        try:
+            await self._run(self.hasher.verify, hashed, password)
+            ok = True
+        except (VerificationError, InvalidHashError):
+            ok = False
+        self.stats["verified"] += 1
+        return ok
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when the stored hash was made with different parameters than the current ones."""
+        try:
+            return self.hasher.check_needs_rehash(hashed)
+        except InvalidHashError:
+            return False
+
+
+password_pool = PasswordPool(
+    PasswordHasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM,
+    ),
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -1,8 +1,15 @@
 import jwt
-from fastapi import Request
+import time
+from collections import OrderedDict
+from fastapi import Depends, Request
+from starlette.requests import HTTPConnection
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
+from .database import get_async_db
+from users.models import User
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import NamedTuple, Optional, Tuple
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -23,18 +30,101 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user_from_cookie(request: Request):
+def token_from_cookie(request: HTTPConnection) -> Optional[str]:
     token = request.cookies.get("access_token")
     if not token:
         return None
-    
+    return token.replace("Bearer ", "")
+
+
+class CachedUser(NamedTuple):
+    # the fields routes and templates read; same names as the User model
+    id: int
+    email: str
+    name: Optional[str]
+
+
+class UserCache:
+    """
+    Bounded LRU of verified token -> user. A hit skips both the JWT decode and the users
+    query. Entries expire after `ttl` seconds and never outlive the token itself.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedUser]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires <= time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def put(self, token: str, user: CachedUser, token_exp: float):
+        lifetime = min(self.ttl, token_exp - time.time())
+        if lifetime <= 0 or self.maxsize <= 0:
+            return
+        self._entries[token] = (time.monotonic() + lifetime, user)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        for token in [t for t, (_, user) in self._entries.items() if user.id == user_id]:
+            del self._entries[token]
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _forget_changed_user(mapper, connection, target):
+    # other processes catch up within USER_CACHE_TTL_SECONDS
+    user_cache.invalidate_user(target.id)
+
+
+async def current_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> Optional[CachedUser]:
+    """The signed-in user, or None. Only a cache miss touches the database."""
+    return await user_from_token(token_from_cookie(request), db)
+
+
+async def user_from_token(token: Optional[str], db: AsyncSession) -> Optional[CachedUser]:
+    """current_user for callers without a request, e.g. WebSocket routes."""
+    if not token:
+        return None
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+
     try:
-        token = token.replace("Bearer ", "")
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except jwt.PyJWTError:
         return None
+    query = select(User.id, User.email, User.name)
+    if payload.get("uid") is not None:
+        query = query.where(User.id == payload["uid"])
+    elif payload.get("sub") is not None:
+        # tokens issued before the user id was added to them
+        query = query.where(User.email == payload["sub"])
+    else:
+        return None
 
+    row = (await db.execute(query)).first()
+    if row is None:
+        return None
+    user = CachedUser(*row)
+    user_cache.put(token, user, payload.get("exp", 0))
+    return user
@@ -0,0 +1,89 @@
+"""
+Login throughput benchmark.
+
+Fires concurrent POST /users/login requests and reports logins/sec, latency percentiles,
+how many were turned away with 503, and how late a 10 ms event-loop ticker ran meanwhile
+(when run in-process that shows whether hashing is blocking the loop).
+
+    python -m benchmarks.login_benchmark                       # in-process against app.main
+    python -m benchmarks.login_benchmark --url http://localhost:8000 --requests 500 --concurrency 50
+
+Needs the database from .env; a throwaway user is registered for the run.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+TICK = 0.01
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+
+async def ticker(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+
+async def run(url, total, concurrency):
+    if url:
+        client = httpx.AsyncClient(base_url=url)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "benchmark-password"
+    async with client:
+        r = await client.post("/users/register", data={"name": "bench", "email": email, "password": password})
+        if r.status_code >= 400:
+            raise SystemExit(f"register failed: {r.status_code}")
+
+        latencies, statuses, lags = [], {}, []
+        remaining = iter(range(total))
+        stop = asyncio.Event()
+
+        async def user():
+            for _ in remaining:
+                start = time.perf_counter()
+                r = await client.post("/users/login", data={"email": email, "password": password})
+                latencies.append(time.perf_counter() - start)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        tick_task = asyncio.create_task(ticker(lags, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await tick_task
+
+    ok = statuses.get(303, 0)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(ok / elapsed, 2),
+        "status_counts": statuses,
+        "latency_ms": {"p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99)},
+        "loop_lag_ms": {"p50": percentile(lags, 0.50), "p99": percentile(lags, 0.99), "max": percentile(lags, 1.0)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--url", default=None, help="running server; omit to benchmark app.main in-process")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.url, args.requests, args.concurrency)), indent=2))
@@ -0,0 +1,114 @@
+"""
+Stand-in HTTP targets for the worker benchmark.
+
+A small keep-alive HTTP/1.1 server that answers any path after a configurable delay, with
+a share of 500s, slow responses and requests that never get an answer. It listens on
+several loopback addresses (127.0.0.1, 127.0.0.2, ...), so the worker's per-host cap
+sees more than one host.
+
+    python -m benchmarks.target_farm --port 9300 --hosts 16 --latency-ms 20 --error-rate 0.02
+
+Prints "ready" once listening, and a JSON summary of what it served on SIGINT/SIGTERM.
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+
+HANG_SECONDS = 3600
+
+
+class TargetFarm:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, slow_rate: float, slow_ms: float, hang_rate: float, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.hang_rate = hang_rate
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "slow": 0, "hung": 0, "connections": 0}
+        self.handlers = set()
+
+    def _outcome(self):
+        """(delay seconds, status); status None means never answer."""
+        draw = self.random.random()
+        if draw < self.hang_rate:
+            self.stats["hung"] += 1
+            return HANG_SECONDS, None
+        draw -= self.hang_rate
+        delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        if draw < self.error_rate:
+            self.stats["errors"] += 1
+            return delay, 500
+        draw -= self.error_rate
+        if draw < self.slow_rate:
+            self.stats["slow"] += 1
+            return self.slow_ms / 1000, 200
+        self.stats["ok"] += 1
+        return delay, 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.stats["requests"] += 1
+                method = head.split(b" ", 1)[0]
+                delay, status = self._outcome()
+                await asyncio.sleep(delay)
+                if status is None:
+                    return
+                body = b"" if method == b"HEAD" else b"ok"
+                reason = b"OK" if status == 200 else b"Internal Server Error"
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\n%s" % (status, reason, body)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.handlers.discard(task)
+            writer.close()
+
+
+def hosts(count: int):
+    return [f"127.0.0.{i}" for i in range(1, count + 1)]
+
+
+async def main(args):
+    farm = TargetFarm(args.latency_ms, args.jitter_ms, args.error_rate, args.slow_rate, args.slow_ms, args.hang_rate, args.seed)
+    server = await asyncio.start_server(farm.handle, hosts(args.hosts), args.port, backlog=4096)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print("ready", flush=True)
+    await stop.wait()
+    server.close()
+    # hung and in-progress requests
+    for task in list(farm.handlers):
+        task.cancel()
+    await asyncio.gather(*farm.handlers, return_exceptions=True)
+    print(json.dumps(farm.stats), flush=True)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--port", type=int, default=9300)
+    parser.add_argument("--hosts", type=int, default=16, help="loopback addresses to listen on")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of requests answered with 500")
+    parser.add_argument("--slow-rate", type=float, default=0.01, help="share of requests answered after --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--hang-rate", type=float, default=0.005, help="share of requests never answered")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake HTTP targets for the worker benchmark")
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""
+Local webhook receiver for trying out alert delivery (servers.alerts).
+
+Accepts POSTs on any path and prints one line per delivery with its alerts. A share of
+requests can be failed with 500 or 429, or answered slowly, to exercise retries, backoff and
+the dead-letter table.
+
+    python -m benchmarks.webhook_receiver --port 9400 --fail-rate 0.3
+
+then add http://127.0.0.1:9400/hook as a destination (POST /servers/api/alerts/destinations).
+Prints a JSON summary on SIGINT/SIGTERM.
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+import time
+
+
+class WebhookReceiver:
+    def __init__(self, fail_rate: float, throttle_rate: float, delay_ms: float, seed: int = 0):
+        self.fail_rate = fail_rate
+        self.throttle_rate = throttle_rate
+        self.delay_ms = delay_ms
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "accepted": 0, "failed": 0, "throttled": 0, "alerts": 0}
+
+    def _status(self) -> int:
+        draw = self.random.random()
+        if draw < self.fail_rate:
+            self.stats["failed"] += 1
+            return 500
+        if draw < self.fail_rate + self.throttle_rate:
+            self.stats["throttled"] += 1
+            return 429
+        self.stats["accepted"] += 1
+        return 200
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n")[1:]:
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                body = await reader.readexactly(length) if length else b""
+                self.stats["requests"] += 1
+                await asyncio.sleep(self.delay_ms / 1000)
+
+                status = self._status()
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    payload = {}
+                alerts = payload.get("alerts", [])
+                if status == 200:
+                    self.stats["alerts"] += len(alerts)
+                summary = ", ".join(f"{a.get('server_name')} {a.get('status')}" for a in alerts)
+                print(f"{time.strftime('%H:%M:%S')} {status} {payload.get('destination')}: {len(alerts)} alert(s) [{summary}]", flush=True)
+
+                reason = {200: b"OK", 429: b"Too Many Requests", 500: b"Internal Server Error"}[status]
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Length: 0\r\n\r\n" % (status, reason))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main(args):
+    receiver = WebhookReceiver(args.fail_rate, args.throttle_rate, args.delay_ms, args.seed)
+    server = await asyncio.start_server(receiver.handle, args.host, args.port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"listening on http://{args.host}:{args.port}", flush=True)
+    await stop.wait()
+    server.close()
+    print(json.dumps(receiver.stats), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local webhook receiver for alert deliveries")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9400)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
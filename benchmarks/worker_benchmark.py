@@ -0,0 +1,272 @@
+"""
+Monitoring worker benchmark.
+
+Starts the fake target farm (benchmarks.target_farm) in a subprocess, seeds --monitors
+UserServer rows for a throwaway user pointing at it, runs monitoring_loop in this process
+and, after a warm-up of one interval, measures for --seconds:
+
+    checks/sec, missed checks, scheduling lag percentiles (from the lateness histogram),
+    analytics rows/sec, event-loop lag from a 10 ms ticker, worker CPU, RSS, and what the
+    farm served
+
+    python -m benchmarks.worker_benchmark --monitors 5000 --interval 10 --seconds 60 --out bench.json
+    python -m benchmarks.worker_benchmark --monitors 5000 --baseline bench.json   # exit 1 on regressions
+
+Needs the Postgres database from .env (the worker relies on Postgres-only SQL, so there is
+no SQLite mode). Monitors already in the database are checked as well and reported as
+other_monitors; run against an otherwise empty database for comparable numbers. The seeded
+rows and their analytics are deleted afterwards.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, func, insert, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from benchmarks import target_farm
+from benchmarks.login_benchmark import percentile, ticker
+from servers.models import ServerStatus, UserServer
+from users.models import User
+
+SEED_BATCH = 1000
+# (report key, higher is better) compared against --baseline
+TRACKED = (
+    ("checks_per_second", True),
+    ("analytics_rows_per_second", True),
+    ("scheduling_lag_ms.p99", False),
+    ("loop_lag_ms.p99", False),
+    ("rss_mb.peak", False),
+)
+
+
+def histogram_buckets(histogram):
+    """Cumulative {le: count} of an unlabelled app.metrics Histogram."""
+    return {
+        dict(labels)["le"]: count
+        for name, labels, count in histogram.samples()
+        if name.endswith("_bucket")
+    }
+
+
+def histogram_quantile(before, after, q):
+    """Quantile in ms of the observations between two bucket snapshots, interpolated like Prometheus does."""
+    bounds = [(float(le), after[le] - before.get(le, 0)) for le in after]
+    total = bounds[-1][1]
+    if not total:
+        return None
+    rank = q * total
+    lower, below = 0.0, 0
+    for upper, cumulative in bounds:
+        if cumulative >= rank:
+            if upper == float("inf"):
+                return round(lower * 1000, 2)
+            inside = cumulative - below
+            fraction = (rank - below) / inside if inside else 0.0
+            return round((lower + (upper - lower) * fraction) * 1000, 2)
+        lower, below = upper, cumulative
+    return None
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def start_farm(args):
+    argv = [
+        sys.executable, "-m", "benchmarks.target_farm",
+        "--port", str(args.port), "--hosts", str(args.hosts),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--slow-rate", str(args.slow_rate),
+        "--slow-ms", str(args.slow_ms), "--hang-rate", str(args.hang_rate), "--seed", str(args.seed),
+    ]
+    process = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.PIPE)
+    line = await asyncio.wait_for(process.stdout.readline(), timeout=10)
+    if line.strip() != b"ready":
+        raise SystemExit("target farm failed to start")
+    return process
+
+
+async def stop_farm(process):
+    process.send_signal(signal.SIGTERM)
+    line = await process.stdout.readline()
+    await process.wait()
+    return json.loads(line) if line else None
+
+
+async def seed(args, run_id):
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(
+            insert(User).values(email=f"bench-{run_id}@example.com", name="bench", password="!").returning(User.id)
+        )
+        for start in range(0, args.monitors, SEED_BATCH):
+            await db.execute(insert(UserServer), [
+                {
+                    "user_id": user_id,
+                    "server_name": f"bench-{i}",
+                    "server_url": f"http://{target_farm.hosts(args.hosts)[i % args.hosts]}:{args.port}/m/{i % args.distinct_urls}",
+                    "interval_seconds": args.interval,
+                    "status": ServerStatus.ACTIVE.value,
+                    "check_type": args.check_type,
+                }
+                for i in range(start, min(start + SEED_BATCH, args.monitors))
+            ])
+        await db.commit()
+        total = await db.scalar(select(func.count()).select_from(UserServer))
+    return user_id, total - args.monitors
+
+
+async def cleanup(user_id):
+    async with AsyncSessionLocal() as db:
+        # analytics and rollups go with the monitors (ON DELETE CASCADE)
+        await db.execute(delete(UserServer).where(UserServer.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def run(args):
+    # set before the worker modules are imported, in case any of them reads these at import time
+    settings.WORKER_CONCURRENCY = args.concurrency
+    settings.WORKER_ID = f"bench-{os.getpid()}"
+
+    from servers import scheduler
+    from servers.analytics_writer import analytics_writer
+    from servers.http_client import close_http_client, start_http_client
+    from servers.probes import PROBE_ERRORS
+    from servers.websocket_manager import manager
+    from servers.worker import monitoring_loop
+
+    run_id = uuid.uuid4().hex[:8]
+    farm = await start_farm(args)
+    user_id, other_monitors = await seed(args, run_id)
+    lags, stop = [], asyncio.Event()
+    try:
+        await start_http_client()
+        analytics_writer.start()
+        await manager.start()
+        worker = asyncio.create_task(monitoring_loop())
+        await asyncio.sleep(args.warmup if args.warmup is not None else args.interval)
+
+        executed = scheduler.CHECKS_EXECUTED.value
+        missed = scheduler.CHECKS_MISSED.value
+        rows = analytics_writer.stats["rows_written"]
+        lateness = histogram_buckets(scheduler.CHECK_LATENESS)
+        cpu = cpu_seconds()
+        tick_task = asyncio.create_task(ticker(lags, stop))
+        started = time.perf_counter()
+        await asyncio.sleep(args.seconds)
+        elapsed = time.perf_counter() - started
+        cpu = cpu_seconds() - cpu
+        stop.set()
+        await tick_task
+
+        executed = scheduler.CHECKS_EXECUTED.value - executed
+        missed = scheduler.CHECKS_MISSED.value - missed
+        rows = analytics_writer.stats["rows_written"] - rows
+        lateness_after = histogram_buckets(scheduler.CHECK_LATENESS)
+        queue_depth = analytics_writer.qsize()
+        rss = rss_mb()
+
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        await analytics_writer.stop()
+        await manager.stop()
+        await close_http_client()
+    finally:
+        farm_stats = await stop_farm(farm)
+        await cleanup(user_id)
+
+    return {
+        "git_revision": git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "tolerance")},
+        "other_monitors": other_monitors,
+        "seconds": round(elapsed, 3),
+        "expected_checks_per_second": round((args.monitors + other_monitors) / args.interval, 2),
+        "checks_per_second": round(executed / elapsed, 2),
+        "checks_missed": int(missed),
+        "scheduling_lag_ms": {
+            "p50": histogram_quantile(lateness, lateness_after, 0.50),
+            "p95": histogram_quantile(lateness, lateness_after, 0.95),
+            "p99": histogram_quantile(lateness, lateness_after, 0.99),
+        },
+        "analytics_rows_per_second": round(rows / elapsed, 2),
+        "analytics_queue_depth_at_end": queue_depth,
+        "probe_errors": {"/".join(v for _, v in labels): int(n) for _, labels, n in PROBE_ERRORS.samples()},
+        "worker_cpu_percent": round(100 * cpu / elapsed, 1),
+        "loop_lag_ms": {"p50": percentile(lags, 0.50), "p99": percentile(lags, 0.99), "max": percentile(lags, 1.0)},
+        "rss_mb": {"end": rss, "peak": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+        "farm": farm_stats,
+    }
+
+
+def lookup(report, key):
+    for part in key.split("."):
+        report = report.get(part) if isinstance(report, dict) else None
+    return report
+
+
+def regressions(report, baseline, tolerance):
+    found = []
+    for key, higher_is_better in TRACKED:
+        new, old = lookup(report, key), lookup(baseline, key)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            found.append(f"{key}: {old} -> {new} ({change:+.0%})")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitoring worker benchmark")
+    parser.add_argument("--monitors", type=int, default=2000)
+    parser.add_argument("--distinct-urls", type=int, default=None, help="defaults to --monitors (no duplicates to coalesce)")
+    parser.add_argument("--interval", type=int, default=10)
+    parser.add_argument("--check-type", default="get")
+    parser.add_argument("--seconds", type=float, default=30.0, help="measured window")
+    parser.add_argument("--warmup", type=float, default=None, help="defaults to one interval")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--out", default=None, help="also write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="earlier report; exit 1 if a tracked figure regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change against --baseline")
+    target_farm.add_arguments(parser.add_argument_group("target farm"))
+    args = parser.parse_args()
+    args.distinct_urls = args.distinct_urls or args.monitors
+
+    # the worker logs with print(); keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
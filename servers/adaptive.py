@@ -0,0 +1,74 @@
+"""
+Adaptive check intervals and a circuit breaker, for monitors with adaptive mode on.
+
+Right after a state change (up -> down or back) a monitor is checked at half its interval
+for a few checks, to confirm the change quickly. Once it has been in the same state for
+ADAPTIVE_STABLE_CHECKS checks its interval grows by GROWTH per check, up to the monitor's
+max_interval_seconds.
+
+While a target is known down the breaker is open: probes use the short
+PING_DOWN_TIMEOUT_SECONDS instead of waiting out the full timeout. Every
+ADAPTIVE_FULL_PROBE_EVERY-th probe uses the normal timeout (half-open), so a slow but
+alive target can still be seen recovering.
+"""
+from typing import Dict, Optional
+
+TIGHT_CHECKS = 3  # checks at half the interval after a state change
+GROWTH = 1.5
+MIN_INTERVAL = 10  # same floor as the forms
+DEFAULT_CEILING_FACTOR = 5  # max interval when the monitor doesn't set one
+
+
+def adaptive_interval(base: float, ceiling: float, stable_checks: int, stable_threshold: int) -> float:
+    if stable_checks < TIGHT_CHECKS:
+        return max(MIN_INTERVAL, base / 2)
+    if stable_checks < stable_threshold:
+        return base
+    return min(ceiling, base * GROWTH ** (stable_checks - stable_threshold + 1))
+
+
+class _State:
+    __slots__ = ("up", "stable", "down_probes")
+
+    def __init__(self, up: bool, stable: int):
+        self.up = up
+        self.stable = stable
+        self.down_probes = 0
+
+
+class AdaptiveTracker:
+    def __init__(self, stable_checks: int = 10, down_timeout: float = 2.0, full_probe_every: int = 5):
+        self.stable_checks = stable_checks
+        self.down_timeout = down_timeout
+        self.full_probe_every = max(1, full_probe_every)
+        self._states: Dict[int, _State] = {}
+        self.stats = {"short_probes": 0, "state_changes": 0}
+
+    def timeout_for(self, server_id: int) -> Optional[float]:
+        """Probe timeout for the next check, or None for the client default."""
+        state = self._states.get(server_id)
+        if state is None or state.up or state.down_probes % self.full_probe_every == 0:
+            return None
+        self.stats["short_probes"] += 1
+        return self.down_timeout
+
+    def record(self, spec, up: bool) -> float:
+        """Feed a check result; returns the interval to use from now on."""
+        state = self._states.get(spec.id)
+        if state is None:
+            # no history (new monitor or restart): start at the normal interval
+            state = self._states[spec.id] = _State(up, TIGHT_CHECKS)
+        elif state.up != up:
+            state.up = up
+            state.stable = 0
+            self.stats["state_changes"] += 1
+        else:
+            state.stable += 1
+        state.down_probes = 0 if up else state.down_probes + 1
+
+        base = spec.interval_seconds
+        ceiling = max(base, spec.max_interval_seconds or base * DEFAULT_CEILING_FACTOR)
+        return adaptive_interval(base, ceiling, state.stable, self.stable_checks)
+
+    def discard(self, server_id: int):
+        self._states.pop(server_id, None)
@@ -0,0 +1,230 @@
+"""
+Status-change alerts, delivered to the monitor owner's webhook destinations.
+
+perform_ping hands a transition to notify(), which only appends to an in-memory queue and
+never waits, so a slow or unreachable webhook can't hold up checks. A background task
+collects alerts for ALERT_BATCH_SECONDS, so alerts that fire together (a shared host going
+down takes its monitors with it) go out as one delivery, and routes them to each owner's
+enabled destinations.
+
+Every destination has its own outbox and delivery task. Deliveries to one destination are
+at least 60 / ALERT_RATE_PER_MINUTE seconds apart; alerts arriving in the meantime are
+merged into the next delivery (up to ALERT_MAX_BATCH per request). A failed delivery is
+retried with exponential backoff and jitter, and after ALERT_MAX_ATTEMPTS, or on a 4xx
+other than 429, it is stored in alert_dead_letters. Limits apply per worker process.
+
+    POST <destination url>
+    {"destination": "ops", "alerts": [{"server_id": 1, "server_name": "api", "server_url": "...",
+     "status": "down", "status_code": 503, "checked_at": "2026-01-01T00:00:00+00:00"}]}
+"""
+import asyncio
+import random
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+import httpx
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.metrics import Callback, Counter
+from servers.models import AlertDeadLetter, AlertDestination, ServerStatus
+
+ALERTS_DROPPED = Counter("pulse_alerts_dropped_total", "Alerts dropped because the alert queue was full")
+ALERT_DELIVERIES = Counter("pulse_alert_deliveries_total", "Webhook deliveries by outcome", ("outcome",))
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class _Outbox:
+    __slots__ = ("id", "name", "url", "pending", "next_allowed", "task")
+
+    def __init__(self, id: int, name: str, url: str, max_pending: int):
+        self.id = id
+        self.name = name
+        self.url = url
+        # while a destination is failing, the oldest alerts give way to new ones
+        self.pending: Deque[dict] = deque(maxlen=max_pending)
+        self.next_allowed = 0.0  # loop time
+        self.task: Optional[asyncio.Task] = None
+
+
+class AlertDispatcher:
+    def __init__(
+        self,
+        batch_seconds: float = 2.0,
+        max_batch: int = 100,
+        rate_per_minute: float = 6.0,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 2.0,
+        timeout: float = 10.0,
+        max_queue: int = 10000,
+    ):
+        self.batch_seconds = batch_seconds
+        self.max_batch = max_batch
+        self.min_spacing = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.timeout = timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._outboxes: Dict[int, _Outbox] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {"queued": 0, "dropped": 0, "delivered": 0, "retries": 0, "dead_lettered": 0}
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def notify(self, spec, status: str, status_code: int, checked_at: datetime):
+        """Queue an alert for a monitor's status change. Never blocks; drops when the queue is full."""
+        alert = {
+            "user_id": spec.user_id,
+            "server_id": spec.id,
+            "server_name": spec.server_name,
+            "server_url": spec.server_url,
+            "status": "up" if status == ServerStatus.ACTIVE.value else "down",
+            "status_code": status_code,
+            "checked_at": checked_at.isoformat(),
+        }
+        try:
+            self._queue.put_nowait(alert)
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            ALERTS_DROPPED.inc()
+
+    def start(self):
+        if self._task is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=False)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop routing and delivering; alerts not delivered yet are lost."""
+        tasks = [t for t in (self._task, *(o.task for o in self._outboxes.values())) if t is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._outboxes.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_seconds
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._route(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Routing {len(batch)} alerts failed: {e!r}")
+
+    async def _route(self, batch: List[dict]):
+        user_ids = {a["user_id"] for a in batch}
+        async with AsyncSessionLocal() as db:
+            destinations = (await db.execute(
+                select(AlertDestination.id, AlertDestination.user_id, AlertDestination.name, AlertDestination.url)
+                .where(AlertDestination.user_id.in_(user_ids), AlertDestination.enabled.is_(True))
+            )).all()
+
+        by_user: Dict[int, list] = {}
+        for destination in destinations:
+            by_user.setdefault(destination.user_id, []).append(destination)
+        for alert in batch:
+            for destination in by_user.get(alert["user_id"], ()):
+                outbox = self._outboxes.get(destination.id)
+                if outbox is None:
+                    outbox = self._outboxes[destination.id] = _Outbox(destination.id, destination.name, destination.url, self.max_batch * 10)
+                # picks up URL edits for the next delivery
+                outbox.name, outbox.url = destination.name, destination.url
+                outbox.pending.append({k: v for k, v in alert.items() if k != "user_id"})
+                if outbox.task is None:
+                    outbox.task = asyncio.create_task(self._drain(outbox))
+
+    async def _drain(self, outbox: _Outbox):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                wait = outbox.next_allowed - loop.time()
+                if wait > 0:
+                    # rate limited: whatever arrives meanwhile joins the next delivery
+                    await asyncio.sleep(wait)
+                if not outbox.pending:
+                    break
+                alerts = [outbox.pending.popleft() for _ in range(min(self.max_batch, len(outbox.pending)))]
+                await self._deliver(outbox, {"destination": outbox.name, "alerts": alerts})
+                outbox.next_allowed = loop.time() + self.min_spacing
+        finally:
+            outbox.task = None
+            # dropped once idle past the rate limit; the next alert recreates it
+            if not outbox.pending and self._outboxes.get(outbox.id) is outbox:
+                del self._outboxes[outbox.id]
+
+    async def _deliver(self, outbox: _Outbox, payload: dict):
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._post(outbox.url, payload)
+                self.stats["delivered"] += 1
+                ALERT_DELIVERIES.labels("delivered").inc()
+                return
+            except DeliveryError as e:
+                error = e
+                if not e.retryable or attempt == self.max_attempts:
+                    break
+            self.stats["retries"] += 1
+            ALERT_DELIVERIES.labels("retried").inc()
+            backoff = self.retry_base_seconds * 2 ** (attempt - 1)
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+
+        self.stats["dead_lettered"] += 1
+        ALERT_DELIVERIES.labels("dead_lettered").inc()
+        print(f"Alert delivery to destination {outbox.id} failed after {attempt} attempt(s): {error}")
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(AlertDeadLetter).values(
+                    destination_id=outbox.id, payload=payload, attempts=attempt, last_error=str(error),
+                ))
+                await db.commit()
+        except Exception as e:
+            # e.g. the destination was deleted meanwhile
+            print(f"Could not store dead letter for destination {outbox.id}: {e!r}")
+
+    async def _post(self, url: str, payload: dict):
+        try:
+            response = await self._client.post(url, json=payload)
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}")
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise DeliveryError(f"HTTP {response.status_code}", retryable)
+
+
+alert_dispatcher = AlertDispatcher(
+    batch_seconds=settings.ALERT_BATCH_SECONDS,
+    max_batch=settings.ALERT_MAX_BATCH,
+    rate_per_minute=settings.ALERT_RATE_PER_MINUTE,
+    max_attempts=settings.ALERT_MAX_ATTEMPTS,
+    retry_base_seconds=settings.ALERT_RETRY_BASE_SECONDS,
+    timeout=settings.ALERT_TIMEOUT_SECONDS,
+    max_queue=settings.ALERT_QUEUE_SIZE,
+)
+
+Callback("pulse_alert_queue_depth", "Alerts waiting to be routed", "gauge", alert_dispatcher.qsize)
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.metrics import Callback, Histogram
+from servers.incidents import status_tracker, write_transitions
+from servers.models import ServerAnalytics, UserServer
+from servers.rollups import rollup_rows, upsert_statement as rollup_upsert
+
+FLUSH_SECONDS = Histogram("pulse_analytics_flush_duration_seconds", "Time to write one batch of check results")
+
+
+class AnalyticsWriter:
+    """
+    Collects check results in memory and writes them in bulk.
+
+    A batch is flushed when it reaches batch_size rows or flush_interval seconds after its
+    first row, whichever comes first. A flush is one executemany INSERT of the analytics
+    rows, one upsert into the minute/hour/day rollups, and the batch's status transitions
+    (servers.incidents). The queue is bounded, so when the database falls behind, submit()
+    waits instead of letting memory grow without limit.
+    """
+
+    def __init__(self, batch_size: int = 500, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {"rows_written": 0, "flushes": 0, "failed_flushes": 0, "last_flush_seconds": 0.0}
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, server_id: int, status_code: int, latency_ms: float, transition: Optional[str], checked_at: datetime, timings: tuple = (None, None, None, None)):
+        """
+        transition: the monitor's new status when this check changed it, else None.
+        timings: (dns_ms, connect_ms, tls_ms, ttfb_ms), see servers.probes.PhaseTimings.
+        """
+        await self._queue.put((server_id, status_code, latency_ms, transition, checked_at, timings))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush whatever is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                # take whatever is already queued without a loop round trip per row,
+                # which under load would cap the batch at a handful of rows
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[tuple]):
+        started = time.perf_counter()
+        try:
+            await self._write_batch(batch)
+        except Exception as e:
+            self.stats["failed_flushes"] += 1
+            print(f"Analytics flush of {len(batch)} rows failed: {e!r}")
+            # the lost transitions are written again on these monitors' next checks
+            status_tracker.forget(item[0] for item in batch if item[3] is not None)
+            return
+        self.stats["rows_written"] += len(batch)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_seconds"] = time.perf_counter() - started
+        FLUSH_SECONDS.observe(self.stats["last_flush_seconds"])
+
+    @staticmethod
+    async def _write_batch(batch: List[tuple]):
+        rows = []
+        transitions = []
+        for server_id, status_code, latency_ms, transition, checked_at, timings in batch:
+            dns_ms, connect_ms, tls_ms, ttfb_ms = timings
+            rows.append({
+                "server_id": server_id,
+                "status_code": status_code,
+                "latency_ms": latency_ms,
+                "created_at": checked_at,
+                "dns_ms": dns_ms,
+                "connect_ms": connect_ms,
+                "tls_ms": tls_ms,
+                "ttfb_ms": ttfb_ms,
+            })
+            if transition is not None:
+                transitions.append((server_id, transition, checked_at, status_code))
+
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(insert(ServerAnalytics), rows)
+            except IntegrityError:
+                # a server was deleted while its results were queued; keep the rest of the batch
+                await db.rollback()
+                server_ids = {r["server_id"] for r in rows}
+                existing = set(await db.scalars(select(UserServer.id).where(UserServer.id.in_(server_ids))))
+                rows = [r for r in rows if r["server_id"] in existing]
+                transitions = [t for t in transitions if t[0] in existing]
+                if rows:
+                    await db.execute(insert(ServerAnalytics), rows)
+            if rows:
+                await db.execute(rollup_upsert(), rollup_rows(rows))
+            await write_transitions(db, transitions)
+            await db.commit()
+
+
+analytics_writer = AnalyticsWriter(
+    batch_size=settings.ANALYTICS_BATCH_SIZE,
+    flush_interval=settings.ANALYTICS_FLUSH_SECONDS,
+    max_queue=settings.ANALYTICS_QUEUE_SIZE,
+)
+
+Callback("pulse_analytics_queue_depth", "Check results waiting to be written", "gauge", analytics_writer.qsize)
+Callback("pulse_analytics_rows_written_total", "Check results written", "counter", lambda: analytics_writer.stats["rows_written"])
+Callback("pulse_analytics_failed_flushes_total", "Batches that failed to write", "counter", lambda: analytics_writer.stats["failed_flushes"])
@@ -1,12 +1,25 @@
+import csv
+import json
 from fastapi import Depends, HTTPException, APIRouter, status, Request, Form, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from servers.models import ServerAnalytics, UserServer
-from app.database import get_db
-from users import models
-from app.config import templates
-from fastapi.responses import RedirectResponse
-from app.security import get_current_user_from_cookie
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional
+from servers.models import AlertDeadLetter, AlertDestination, CheckType, ServerAnalytics, UserServer
+from app.database import AsyncSessionLocal, get_async_db
+from app.config import settings, templates
+from fastapi.responses import RedirectResponse, StreamingResponse
+from app.security import CachedUser, current_user, token_from_cookie, user_from_token
 from servers.websocket_manager import manager
+from servers.registry import MonitorSpec, publish_monitor_change, registry
+from servers.bulk import parse_monitors, upsert_monitors
+from servers.dashboard import dashboard_cache
+from servers.export import FORMATS, ExportCursor, as_utc, export_rows, gzipped
+from servers.incidents import incident_summary
+from servers.recent import recent_checks
+from servers.rollups import WINDOWS, window_stats
+
+CHECK_TYPES = [t.value for t in CheckType]
 
 router = APIRouter(
     prefix="/servers",
@@ -19,64 +32,113 @@ async def create_server(
     name: str = Form(...),
     url: str = Form(...),
     interval: int = Form(...),
-    db: Session = Depends(get_db)
+    adaptive: bool = Form(False),
+    max_interval: Optional[int] = Form(None),
+    check_type: str = Form(CheckType.GET.value),
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
 ):
-    email = get_current_user_from_cookie(request)
-    if not email:
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    user = db.query(models.User).filter(models.User.email == email).first()
 
     if interval < 10:
         return templates.TemplateResponse(
             "create_server.html",
             {"request": request, "error": "Interval must be at least 10 seconds"}
         )
+    if max_interval is not None and max_interval < interval:
+        return templates.TemplateResponse(
+            "create_server.html",
+            {"request": request, "error": "Max interval can't be shorter than the interval"}
+        )
+    if check_type not in CHECK_TYPES:
+        return templates.TemplateResponse(
+            "create_server.html",
+            {"request": request, "error": "Unknown check type"}
+        )
     
     server = UserServer(
         user_id=user.id, 
         server_name=name,
         server_url=url,
-        interval_seconds=interval
+        interval_seconds=interval,
+        adaptive=adaptive,
+        max_interval_seconds=max_interval,
+        check_type=check_type
     )
     try:
         db.add(server)
-        db.commit()
-        db.refresh(server)
+        await db.flush()
+        await publish_monitor_change(db, "upsert", server)
+        await db.commit()
+        await db.refresh(server)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    registry.apply("upsert", server.id, MonitorSpec.from_server(server))
+    dashboard_cache.invalidate(user.id)
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 
+@router.post("/bulk")
+async def bulk_upsert_servers(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
+):
+    """
+    Create or update many monitors at once. Send JSON ([{"key", "name", "url", "interval"}, ...])
+    or text/csv with those columns. Rows are matched on `key`; the response has one result per row.
+    """
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    try:
+        rows = parse_monitors(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Could not parse monitors: {e}")
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_IMPORT_MAX_ROWS} monitors per request",
+        )
+
+    results = await upsert_monitors(db, user.id, rows, batch_size=settings.BULK_IMPORT_BATCH_SIZE)
+    dashboard_cache.invalidate(user.id)
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"summary": summary, "results": results}
+
+
 @router.post("/delete/{server_id}")
 async def delete_server(
     request: Request,
     server_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
 ):
-    email = get_current_user_from_cookie(request)
-    if not email:
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    user = db.query(models.User).filter(models.User.email == email).first()
-    server = db.query(UserServer).filter(UserServer.id == server_id, UserServer.user_id == user.id).first()
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
     if not server:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
     try:
-        db.delete(server)
-        db.commit()
+        await publish_monitor_change(db, "delete", server)
+        await db.delete(server)
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    registry.apply("delete", server_id)
+    dashboard_cache.invalidate(user.id)
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.get("/edit/{server_id}")
-async def show_edit_form(request: Request, server_id: int, db: Session = Depends(get_db)):
-    email = get_current_user_from_cookie(request)
-    if not email:
+async def show_edit_form(request: Request, server_id: int, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    if not user:
         return RedirectResponse(url="/signin", status_code=303)
         
-    user = db.query(models.User).filter(models.User.email == email).first()
-    server = db.query(UserServer).filter(UserServer.id == server_id, UserServer.user_id == user.id).first()
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
     
     if not server:
         return RedirectResponse(url="/dashboard", status_code=303)
@@ -90,13 +152,15 @@ async def edit_server(
     name: str = Form(...),
     url: str = Form(...),
     interval: int = Form(...),
-    db: Session = Depends(get_db)
+    adaptive: bool = Form(False),
+    max_interval: Optional[int] = Form(None),
+    check_type: str = Form(CheckType.GET.value),
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
 ):
-    email = get_current_user_from_cookie(request)
-    if not email:
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-    user = db.query(models.User).filter(models.User.email == email).first()
-    server = db.query(UserServer).filter(UserServer.id == server_id, UserServer.user_id == user.id).first()
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
     if not server:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
     
@@ -105,28 +169,47 @@ async def edit_server(
             "edit_server.html",
             {"request": request, "server": server, "error": "Interval must be at least 10 seconds"}
         )
+    if max_interval is not None and max_interval < interval:
+        return templates.TemplateResponse(
+            "edit_server.html",
+            {"request": request, "server": server, "error": "Max interval can't be shorter than the interval"}
+        )
+    if check_type not in CHECK_TYPES:
+        return templates.TemplateResponse(
+            "edit_server.html",
+            {"request": request, "server": server, "error": "Unknown check type"}
+        )
     
     server.server_name = name
     server.server_url = url
     server.interval_seconds = interval
+    server.adaptive = adaptive
+    server.max_interval_seconds = max_interval
+    server.check_type = check_type
     try:
-        db.commit()
-        db.refresh(server)
+        await publish_monitor_change(db, "upsert", server)
+        await db.commit()
+        await db.refresh(server)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    registry.apply("upsert", server.id, MonitorSpec.from_server(server))
+    dashboard_cache.invalidate(user.id)
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.get("/analytics/{server_id}")
-async def get_analytics(server_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_analytics(server_id: int, request: Request, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
 
-    email = get_current_user_from_cookie(request)
-    if not email:
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
     
-    user = db.query(models.User).filter(models.User.email == email).first()
-    server = db.query(UserServer).filter(UserServer.id == server_id, UserServer.user_id == user.id).first()
-    last_10 = db.query(ServerAnalytics).filter(ServerAnalytics.server_id == server_id).order_by(ServerAnalytics.created_at.desc()).limit(10).all()
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
+    if not server:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
+    # served from the worker's ring buffer when it runs in this process
+    last_10 = recent_checks.latest(server_id, 10)
+    if last_10 is None:
+        last_10 = (await db.scalars(select(ServerAnalytics).where(ServerAnalytics.server_id == server_id).order_by(ServerAnalytics.created_at.desc()).limit(10))).all()
     
     return templates.TemplateResponse("analytics.html", {
         "request": request, 
@@ -136,6 +219,186 @@ async def get_analytics(server_id: int, request: Request, db: Session = Depends(
     })
 
 
+@router.get("/api/{server_id}/recent")
+async def get_recent_checks(server_id: int, request: Request, limit: int = 50, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Most recent checks, newest first."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
+    if not server:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
+
+    limit = max(1, min(limit, settings.RECENT_CHECKS_DEPTH))
+    checks = recent_checks.latest(server_id, limit)
+    if checks is None:
+        checks = (await db.scalars(select(ServerAnalytics).where(ServerAnalytics.server_id == server_id).order_by(ServerAnalytics.created_at.desc()).limit(limit))).all()
+
+    return [
+        {"created_at": c.created_at.isoformat(), "status_code": c.status_code, "latency_ms": c.latency_ms}
+        for c in checks
+    ]
+
+@router.get("/api/{server_id}/stats")
+async def get_stats(server_id: int, request: Request, window: str = "24h", db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Uptime and latency summary for the last 1h/24h/7d/30d/90d, read from the rollups."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if window not in WINDOWS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"window must be one of {', '.join(WINDOWS)}")
+
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
+    if not server:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
+
+    return await window_stats(db, server_id, window)
+
+
+@router.get("/api/{server_id}/incidents")
+async def get_incidents(server_id: int, request: Request, window: str = "24h", db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Outages in the last 1h/24h/7d/30d/90d and the time-based uptime they leave, read from the incident log."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if window not in WINDOWS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"window must be one of {', '.join(WINDOWS)}")
+
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
+    if not server:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
+
+    return await incident_summary(db, server_id, window, server.created_at)
+
+
+def _destination_dict(destination: AlertDestination) -> dict:
+    return {"id": destination.id, "name": destination.name, "url": destination.url, "enabled": destination.enabled}
+
+
+@router.get("/api/alerts/destinations")
+async def list_alert_destinations(db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Webhooks that receive this user's up/down alerts (see servers.alerts for the payload)."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    destinations = (await db.scalars(select(AlertDestination).where(AlertDestination.user_id == user.id).order_by(AlertDestination.id))).all()
+    return [_destination_dict(d) for d in destinations]
+
+
+@router.post("/api/alerts/destinations")
+async def create_alert_destination(
+    name: str = Form(...),
+    url: str = Form(...),
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if not url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="url must be an http(s) URL")
+
+    destination = AlertDestination(user_id=user.id, name=name, url=url)
+    try:
+        db.add(destination)
+        await db.commit()
+        await db.refresh(destination)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    return _destination_dict(destination)
+
+
+@router.post("/api/alerts/destinations/{destination_id}/delete")
+async def delete_alert_destination(destination_id: int, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    destination = await db.scalar(select(AlertDestination).where(AlertDestination.id == destination_id, AlertDestination.user_id == user.id))
+    if not destination:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Destination not found")
+    try:
+        await db.delete(destination)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    return {"deleted": destination_id}
+
+
+@router.get("/api/alerts/dead-letters")
+async def list_dead_letters(limit: int = 50, db: AsyncSession = Depends(get_async_db), user: Optional[CachedUser] = Depends(current_user)):
+    """Alert deliveries that failed for good, newest first."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    rows = (await db.execute(
+        select(AlertDeadLetter, AlertDestination.name)
+        .join(AlertDestination, AlertDestination.id == AlertDeadLetter.destination_id)
+        .where(AlertDestination.user_id == user.id)
+        .order_by(AlertDeadLetter.created_at.desc())
+        .limit(max(1, min(limit, 500)))
+    )).all()
+    return [
+        {
+            "destination_id": letter.destination_id,
+            "destination": name,
+            "created_at": letter.created_at.isoformat(),
+            "attempts": letter.attempts,
+            "last_error": letter.last_error,
+            "payload": letter.payload,
+        }
+        for letter, name in rows
+    ]
+
+
+def _export_response(request: Request, server_ids, format: str, start, end, cursor, filename: str):
+    if format not in FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of {', '.join(FORMATS)}")
+    try:
+        after = ExportCursor.parse(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    body = export_rows(server_ids, format, as_utc(start), as_utc(end), after, chunk_rows=settings.EXPORT_CHUNK_ROWS)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=FORMATS[format], headers=headers)
+
+
+@router.get("/api/export")
+async def export_all_analytics(
+    request: Request,
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
+):
+    """Check history of all the user's servers in [start, end), streamed as NDJSON or CSV."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    server_ids = (await db.scalars(select(UserServer.id).where(UserServer.user_id == user.id))).all()
+    return _export_response(request, server_ids, format, start, end, cursor, "analytics")
+
+
+@router.get("/api/{server_id}/export")
+async def export_server_analytics(
+    server_id: int,
+    request: Request,
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CachedUser] = Depends(current_user)
+):
+    """Check history of one server in [start, end), streamed as NDJSON or CSV."""
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    server = await db.scalar(select(UserServer).where(UserServer.id == server_id, UserServer.user_id == user.id))
+    if not server:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Server not found")
+    return _export_response(request, [server_id], format, start, end, cursor, f"server-{server_id}")
+
+
 @router.websocket("/ws/server/{server_id}")
 async def websocket_endpoint(websocket: WebSocket, server_id: int):
     await manager.connect(websocket, server_id)
@@ -144,5 +407,58 @@ async def websocket_endpoint(websocket: WebSocket, server_id: int):
             # Keep the connection alive
             await websocket.receive_text() 
     except WebSocketDisconnect as e:
+        pass
+    finally:
         manager.disconnect(websocket, server_id)
 
+
+
+async def _owned_server_ids(user_id: int, requested) -> list:
+    """The user's servers among `requested`, a list of ids or "all"."""
+    query = select(UserServer.id).where(UserServer.user_id == user_id)
+    if requested != "all":
+        if not isinstance(requested, list):
+            raise ValueError('expected a list of server ids or "all"')
+        query = query.where(UserServer.id.in_([int(i) for i in requested]))
+    async with AsyncSessionLocal() as db:
+        return list(await db.scalars(query))
+
+
+@router.websocket("/ws/dashboard")
+async def dashboard_websocket(websocket: WebSocket):
+    """
+    Live updates for many servers over one socket, authenticated once by the session cookie.
+
+    Send {"subscribe": [1, 2]} or {"subscribe": "all"}, and {"unsubscribe": [...] or "all"}.
+    Each request is answered with {"type": "subscribed", "server_ids": [...]}; "all" covers
+    the servers that exist at that moment. Results arrive at most every WS_BATCH_MILLISECONDS
+    as {"type": "updates", "updates": {"<server_id>": {...}}}, each holding only the fields
+    that changed since the last frame (status, latency, phases, timestamp).
+    """
+    async with AsyncSessionLocal() as db:
+        user = await user_from_token(token_from_cookie(websocket), db)
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    connection = await manager.connect_multiplexed(websocket)
+    try:
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+                if connection not in manager.multiplexed:
+                    # evicted as too slow; the manager is closing the socket
+                    break
+                if "subscribe" in request:
+                    await manager.subscribe(connection, await _owned_server_ids(user.id, request["subscribe"]))
+                if "unsubscribe" in request:
+                    removed = request["unsubscribe"]
+                    manager.unsubscribe(connection, list(connection.server_ids) if removed == "all" else [int(i) for i in removed])
+            except (ValueError, TypeError, AttributeError) as e:
+                connection.reply({"type": "error", "detail": f"Bad request: {e}"})
+                continue
+            connection.reply({"type": "subscribed", "server_ids": sorted(connection.server_ids)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect_multiplexed(connection)
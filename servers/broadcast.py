@@ -0,0 +1,298 @@
+"""
+Broadcast backends that carry live check results to every process holding WebSockets.
+
+- memory:   in-process only (a single uvicorn worker)
+- postgres: LISTEN/NOTIFY, one channel per server, so a process only receives the
+            servers its viewers are watching
+- broker:   the small line-based broker in servers/broker.py (python -m servers.broker)
+
+Subscriptions are reference-counted per server_id: the first subscriber starts listening
+for a server and the last unsubscribe stops it.
+"""
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Set, Tuple
+
+from app.config import settings
+
+Deliver = Callable[[int, str], None]
+
+
+class BroadcastBackend:
+    def __init__(self):
+        self._refcounts: Dict[int, int] = {}
+        self._listens: Dict[int, asyncio.Task] = {}  # LISTENs still in flight, by server_id
+        self._tasks: Set[asyncio.Task] = set()  # unlisten tasks; the loop only keeps weak references
+        self._deliver: Deliver = lambda server_id, text: None
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def bind(self, deliver: Deliver):
+        """Set the callback that receives (server_id, json_text) for subscribed servers."""
+        self._deliver = deliver
+
+    def is_subscribed(self, server_id: int) -> bool:
+        return server_id in self._refcounts
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, server_id: int):
+        count = self._refcounts.get(server_id, 0)
+        self._refcounts[server_id] = count + 1
+        if count == 0:
+            listen = self._listens[server_id] = asyncio.ensure_future(self._listen(server_id))
+            try:
+                await listen
+            finally:
+                if self._listens.get(server_id) is listen:
+                    del self._listens[server_id]
+
+    def unsubscribe(self, server_id: int):
+        count = self._refcounts.get(server_id, 0)
+        if count <= 1:
+            self._refcounts.pop(server_id, None)
+            if count == 1:
+                task = asyncio.create_task(self._unlisten_if_unused(server_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        else:
+            self._refcounts[server_id] = count - 1
+
+    async def _unlisten_if_unused(self, server_id: int):
+        # a LISTEN still in flight would otherwise land after this and never be undone
+        listen = self._listens.get(server_id)
+        if listen is not None:
+            await asyncio.wait([listen])
+        # a new subscriber may have arrived between unsubscribe() and this task running
+        if server_id not in self._refcounts:
+            try:
+                await self._unlisten(server_id)
+            except Exception as e:
+                print(f"Broadcast unsubscribe for server {server_id} failed: {e!r}")
+
+    def publish(self, server_id: int, text: str):
+        """Must not block: called from the pinger for every check."""
+        raise NotImplementedError
+
+    def _received(self, server_id: int, text: str):
+        if server_id in self._refcounts:
+            self.stats["delivered"] += 1
+            self._deliver(server_id, text)
+
+    async def _listen(self, server_id: int):
+        pass
+
+    async def _unlisten(self, server_id: int):
+        pass
+
+
+class MemoryBackend(BroadcastBackend):
+    def publish(self, server_id: int, text: str):
+        self.stats["published"] += 1
+        self._received(server_id, text)
+
+
+class PostgresBackend(BroadcastBackend):
+    """
+    NOTIFY pulse_live_<server_id> carries each result. Publishes are queued and sent in
+    batches by a background task, so the pinger never waits on the database. The same task
+    checks the LISTEN connection every HEALTH_CHECK_SECONDS, or as soon as asyncpg reports it
+    terminated, and reconnects and listens again, so processes that only receive recover too.
+    """
+
+    CHANNEL_PREFIX = "pulse_live_"
+    MAX_PENDING = 10000
+    HEALTH_CHECK_SECONDS = 5.0
+
+    def __init__(self):
+        super().__init__()
+        self._conn = None  # SQLAlchemy AsyncConnection kept open for LISTEN
+        self._driver = None  # underlying asyncpg connection
+        self._lock = asyncio.Lock()  # asyncpg runs one operation per connection at a time
+        self._outbox: Deque[Tuple[str, str]] = deque(maxlen=self.MAX_PENDING)
+        self._pending = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def channel(self, server_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{server_id}"
+
+    async def start(self):
+        await self._connect()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = self._driver = None
+
+    async def _connect(self):
+        from app.database import async_engine
+
+        self._conn = await async_engine.connect()
+        raw = await self._conn.get_raw_connection()
+        self._driver = raw.driver_connection
+        self._driver.add_termination_listener(self._on_terminated)
+        for server_id in list(self._refcounts):
+            await self._driver.add_listener(self.channel(server_id), self._on_notify)
+
+    def _on_terminated(self, connection):
+        # wake _run to reconnect right away instead of at the next health check
+        self._pending.set()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            server_id = int(channel[len(self.CHANNEL_PREFIX):])
+        except ValueError:
+            return
+        self._received(server_id, payload)
+
+    async def _listen(self, server_id: int):
+        if self._driver is None:
+            return  # picked up by _connect()
+        async with self._lock:
+            await self._driver.add_listener(self.channel(server_id), self._on_notify)
+
+    async def _unlisten(self, server_id: int):
+        if self._driver is None:
+            return
+        async with self._lock:
+            if server_id not in self._refcounts and not self._driver.is_closed():
+                await self._driver.remove_listener(self.channel(server_id), self._on_notify)
+
+    def publish(self, server_id: int, text: str):
+        if len(self._outbox) == self._outbox.maxlen:
+            self.stats["dropped"] += 1
+        self._outbox.append((self.channel(server_id), text))
+        self.stats["published"] += 1
+        self._pending.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._pending.wait(), timeout=self.HEALTH_CHECK_SECONDS)
+                idle = False
+            except asyncio.TimeoutError:
+                idle = True
+            self._pending.clear()
+            try:
+                if self._driver is None or self._driver.is_closed():
+                    await self._reconnect()
+                elif idle:
+                    # catches connections that died without the driver noticing
+                    async with self._lock:
+                        await self._driver.execute("SELECT 1")
+                while self._outbox:
+                    batch = [self._outbox.popleft() for _ in range(min(len(self._outbox), 500))]
+                    async with self._lock:
+                        await self._driver.executemany("SELECT pg_notify($1, $2)", batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["dropped"] += len(self._outbox)
+                self._outbox.clear()
+                print(f"Postgres broadcast failed, reconnecting: {e!r}")
+                self._driver = None
+                await asyncio.sleep(1)
+
+    async def _reconnect(self):
+        if self._conn is not None:
+            try:
+                await self._conn.invalidate()
+            except Exception:
+                pass
+            self._conn = None
+        await self._connect()
+
+
+class BrokerBackend(BroadcastBackend):
+    """
+    Client for servers/broker.py. Frames are single lines:
+    "SUB <id>", "UNSUB <id>", "PUB <id> <json>" from us and "MSG <id> <json>" from the broker.
+    """
+
+    MAX_WRITE_BUFFER = 1024 * 1024  # bytes; beyond this new publishes are dropped
+
+    def __init__(self, host: str, port: int):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _send(self, line: str) -> bool:
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            return False
+        if writer.transport.get_write_buffer_size() > self.MAX_WRITE_BUFFER:
+            return False
+        writer.write(line.encode() + b"\n")
+        return True
+
+    async def _listen(self, server_id: int):
+        self._send(f"SUB {server_id}")
+
+    async def _unlisten(self, server_id: int):
+        self._send(f"UNSUB {server_id}")
+
+    def publish(self, server_id: int, text: str):
+        self.stats["published"] += 1
+        if not self._send(f"PUB {server_id} {text}"):
+            self.stats["dropped"] += 1
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self.host, self.port)
+                delay = 1
+                # (re)subscribe to everything this process is watching
+                for server_id in list(self._refcounts):
+                    self._send(f"SUB {server_id}")
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("broker closed the connection")
+                    parts = line.decode().rstrip("\n").split(" ", 2)
+                    if len(parts) == 3 and parts[0] == "MSG":
+                        self._received(int(parts[1]), parts[2])
+            except asyncio.CancelledError:
+                if self._writer is not None:
+                    self._writer.close()
+                raise
+            except Exception as e:
+                print(f"Broadcast broker connection lost, retrying in {delay}s: {e!r}")
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def create_backend() -> BroadcastBackend:
+    if settings.BROADCAST_BACKEND == "postgres":
+        return PostgresBackend()
+    if settings.BROADCAST_BACKEND == "broker":
+        return BrokerBackend(settings.BROADCAST_BROKER_HOST, settings.BROADCAST_BROKER_PORT)
+    return MemoryBackend()
@@ -0,0 +1,91 @@
+"""
+Minimal pub/sub broker for live updates across processes (BROADCAST_BACKEND=broker).
+
+One TCP connection per app process, newline-delimited frames:
+    SUB <server_id>            start receiving results for a server
+    UNSUB <server_id>          stop receiving them
+    PUB <server_id> <json>     publish a result
+The broker forwards each PUB as "MSG <server_id> <json>" to every connection subscribed to
+that server. Connections that stop reading are skipped rather than buffered without bound.
+
+Run with: python -m servers.broker [--host 0.0.0.0] [--port 7700]
+"""
+import argparse
+import asyncio
+from typing import Dict, Set
+
+from app.config import settings
+
+MAX_WRITE_BUFFER = 4 * 1024 * 1024  # bytes queued for one subscriber before we drop its messages
+
+
+class Broker:
+    def __init__(self):
+        self.subscribers: Dict[int, Set[asyncio.StreamWriter]] = {}
+        self.stats = {"published": 0, "forwarded": 0, "dropped": 0}
+
+    def _publish(self, server_id: int, data: bytes):
+        self.stats["published"] += 1
+        frame = b"MSG %d %s\n" % (server_id, data)
+        for writer in self.subscribers.get(server_id, ()):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                self.stats["dropped"] += 1
+                continue
+            writer.write(frame)
+            self.stats["forwarded"] += 1
+
+    def _unsubscribe(self, server_id: int, writer: asyncio.StreamWriter):
+        writers = self.subscribers.get(server_id)
+        if writers is not None:
+            writers.discard(writer)
+            if not writers:
+                del self.subscribers[server_id]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[int] = set()
+        peer = writer.get_extra_info("peername")
+        print(f"Broker: client connected {peer}")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.rstrip(b"\n").split(b" ", 2)
+                try:
+                    command, server_id = parts[0], int(parts[1])
+                except (IndexError, ValueError):
+                    continue
+                if command == b"PUB" and len(parts) == 3:
+                    self._publish(server_id, parts[2])
+                elif command == b"SUB":
+                    subscribed.add(server_id)
+                    self.subscribers.setdefault(server_id, set()).add(writer)
+                elif command == b"UNSUB":
+                    subscribed.discard(server_id)
+                    self._unsubscribe(server_id, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for server_id in subscribed:
+                self._unsubscribe(server_id, writer)
+            writer.close()
+            print(f"Broker: client disconnected {peer}")
+
+
+async def serve(host: str, port: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle, host, port)
+    print(f"Broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PulseAPI live update broker")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=settings.BROADCAST_BROKER_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
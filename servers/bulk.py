@@ -0,0 +1,178 @@
+"""
+Bulk create/update of monitors from JSON or CSV.
+
+Rows are matched on a client-supplied `key` (stored as user_servers.external_key), so
+re-sending the same file is a no-op. Each batch is one INSERT ... ON CONFLICT DO UPDATE in its
+own transaction, together with a single NOTIFY that tells the workers which ids to re-read.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from servers.models import CheckType, ServerStatus, UserServer
+from servers.registry import MonitorSpec, publish_monitor_reload, registry
+
+MIN_INTERVAL = 10  # same rule as the create/edit forms
+CONSTRAINT = "uq_user_servers_user_id_external_key"
+UPDATABLE = ("server_name", "server_url", "interval_seconds", "adaptive", "max_interval_seconds", "check_type")
+CHECK_TYPES = {t.value for t in CheckType}
+
+
+def parse_monitors(body: bytes, content_type: str) -> List[dict]:
+    """
+    JSON (a list, or {"monitors": [...]}) or CSV with a header row:
+    key,name,url,interval and optionally adaptive,max_interval,check_type.
+    """
+    if "csv" in content_type:
+        return list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get("monitors")
+    if not isinstance(data, list):
+        raise ValueError('expected a JSON list of monitors or {"monitors": [...]}')
+    return data
+
+
+def whole_seconds(value, field: str) -> int:
+    """An int from JSON, or the text of a CSV cell; bools, fractions and blanks are rejected."""
+    if isinstance(value, bool):
+        value = None
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            value = None
+    if not isinstance(value, int):
+        raise ValueError(f"{field} must be a whole number of seconds")
+    return value
+
+
+def validate_monitor(raw) -> dict:
+    if not isinstance(raw, dict):
+        raise ValueError("row must be an object")
+    key = str(raw.get("key") or "").strip()
+    name = str(raw.get("name") or "").strip()
+    url = str(raw.get("url") or "").strip()
+    if not key:
+        raise ValueError("key is required")
+    if len(key) > 255:
+        raise ValueError("key is longer than 255 characters")
+    if not name:
+        raise ValueError("name is required")
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        raise ValueError("url must be an http(s) URL")
+    interval = raw.get("interval")
+    interval = 60 if interval is None else whole_seconds(interval, "interval")
+    if interval < MIN_INTERVAL:
+        raise ValueError(f"Interval must be at least {MIN_INTERVAL} seconds")
+    adaptive = str(raw.get("adaptive") or "").strip().lower() in ("1", "true", "yes", "on")
+    max_interval = raw.get("max_interval")
+    # an empty CSV cell leaves it unset, like a missing column
+    if max_interval in (None, ""):
+        max_interval = None
+    else:
+        max_interval = whole_seconds(max_interval, "max_interval")
+        if max_interval < interval:
+            raise ValueError("max_interval can't be shorter than interval")
+    check_type = str(raw.get("check_type") or CheckType.GET.value).strip().lower()
+    if check_type not in CHECK_TYPES:
+        raise ValueError(f"check_type must be one of {', '.join(sorted(CHECK_TYPES))}")
+    return {
+        "external_key": key,
+        "server_name": name,
+        "server_url": url,
+        "interval_seconds": interval,
+        "adaptive": adaptive,
+        "max_interval_seconds": max_interval,
+        "check_type": check_type,
+    }
+
+
+def upsert_statement(values: List[dict]):
+    stmt = pg_insert(UserServer).values(values)
+    changed = or_(*(
+        getattr(UserServer, column).is_distinct_from(getattr(stmt.excluded, column))
+        for column in UPDATABLE
+    ))
+    return stmt.on_conflict_do_update(
+        constraint=CONSTRAINT,
+        set_={**{column: getattr(stmt.excluded, column) for column in UPDATABLE}, "updated_at": stmt.excluded.updated_at},
+        # identical rows are left alone, so they don't come back from RETURNING
+        where=changed,
+    ).returning(
+        UserServer.id,
+        UserServer.user_id,
+        UserServer.server_name,
+        UserServer.server_url,
+        UserServer.interval_seconds,
+        UserServer.adaptive,
+        UserServer.max_interval_seconds,
+        UserServer.check_type,
+        UserServer.external_key,
+        literal_column("xmax = 0").label("created"),
+    )
+
+
+async def upsert_monitors(db, user_id: int, rows: List[dict], batch_size: int = 500) -> List[dict]:
+    """Validate and upsert rows; returns one result per input row, in order."""
+    results: List[Optional[dict]] = [None] * len(rows)
+    valid = []
+    seen = set()
+    for i, raw in enumerate(rows):
+        try:
+            values = validate_monitor(raw)
+        except ValueError as e:
+            results[i] = {"row": i, "key": raw.get("key") if isinstance(raw, dict) else None, "status": "error", "error": str(e)}
+            continue
+        if values["external_key"] in seen:
+            results[i] = {"row": i, "key": values["external_key"], "status": "error", "error": "duplicate key in this request"}
+            continue
+        seen.add(values["external_key"])
+        valid.append((i, values))
+
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        now = datetime.utcnow()
+        values = [
+            {**v, "user_id": user_id, "status": ServerStatus.ACTIVE.value, "created_at": now, "updated_at": now}
+            for _, v in batch
+        ]
+        try:
+            written = (await db.execute(upsert_statement(values))).all()
+            await publish_monitor_reload(db, [row.id for row in written])
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"Bulk monitor upsert failed: {e!r}")
+            for i, v in batch:
+                results[i] = {"row": i, "key": v["external_key"], "status": "error", "error": "database error"}
+            continue
+
+        by_key = {row.external_key: row for row in written}
+        unchanged = [v["external_key"] for _, v in batch if v["external_key"] not in by_key]
+        existing = {}
+        if unchanged:
+            existing = dict((await db.execute(
+                select(UserServer.external_key, UserServer.id)
+                .where(UserServer.user_id == user_id, UserServer.external_key.in_(unchanged))
+            )).all())
+
+        for i, v in batch:
+            row = by_key.get(v["external_key"])
+            if row is None:
+                results[i] = {"row": i, "key": v["external_key"], "status": "unchanged", "id": existing.get(v["external_key"])}
+            else:
+                results[i] = {"row": i, "key": v["external_key"], "status": "created" if row.created else "updated", "id": row.id}
+        # this process right away; other processes re-read the ids on the NOTIFY
+        for row in written:
+            registry.apply("upsert", row.id, MonitorSpec.from_server(row))
+    return results
@@ -0,0 +1,117 @@
+"""
+Coalesced checks for monitors that point at the same URL.
+
+Monitors are grouped by normalized URL, check type and probe timeout. While a probe for a
+group is in flight, other members wait for it instead of sending their own request, and a
+finished result is reused by members that come due within COALESCE_WINDOW_SECONDS. Every member
+still records and broadcasts the result as its own check. Monitors of the same URL also
+share a scheduler phase (phase_key), so with equal intervals their ticks line up.
+
+Probes against one host are capped at HOST_MAX_CONCURRENCY at a time; latency is measured
+after the slot is taken, so waiting for it doesn't count against the target.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from app.config import settings
+from app.metrics import Callback
+from servers.models import CheckType
+from servers.probes import DEFAULT_PORTS, ProbeResult, probe
+
+
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host, drop the default port and fragment, empty path -> "/"."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def phase_key(url: str) -> int:
+    """Stable per-URL key for the scheduler's phase, so duplicates fire together."""
+    return int.from_bytes(hashlib.blake2b(normalize_url(url).encode(), digest_size=8).digest(), "big")
+
+
+class CheckCoalescer:
+    def __init__(self, window: float = 5.0, host_concurrency: int = 10, maxsize: int = 100000):
+        self.window = window
+        self.host_concurrency = host_concurrency
+        self.maxsize = maxsize
+        self._in_flight: Dict[Tuple[str, str, Optional[float]], asyncio.Task] = {}
+        self._results: Dict[Tuple[str, str, Optional[float]], Tuple[float, ProbeResult]] = {}
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "reused": 0, "host_waits": 0}
+
+    async def check(self, url: str, timeout: Optional[float] = None, check_type: str = CheckType.GET.value) -> ProbeResult:
+        normalized = normalize_url(url)
+        key = (normalized, check_type, timeout)
+
+        cached = self._results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.stats["reused"] += 1
+            return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._probe(normalized, url, check_type, timeout))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.stats["coalesced"] += 1
+        # shielded: a cancelled member doesn't cancel the probe the others wait on
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.window <= 0:
+            return
+        now = time.monotonic()
+        if len(self._results) >= self.maxsize:
+            self._results = {k: r for k, r in self._results.items() if r[0] > now}
+        if len(self._results) < self.maxsize:
+            self._results[key] = (now + self.window, task.result())
+
+    async def _probe(self, normalized: str, url: str, check_type: str, timeout: Optional[float]) -> ProbeResult:
+        host = urlsplit(normalized).netloc
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self.host_concurrency)
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+        try:
+            if semaphore.locked():
+                self.stats["host_waits"] += 1
+            async with semaphore:
+                self.stats["requests"] += 1
+                return await probe(url, check_type, timeout)
+        finally:
+            # forget idle hosts, so the map only holds hosts with probes running
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                del self._hosts[host]
+
+
+coalescer = CheckCoalescer(settings.COALESCE_WINDOW_SECONDS, settings.HOST_MAX_CONCURRENCY)
+
+Callback(
+    "pulse_coalesced_checks_total",
+    "Checks answered by another monitor's probe of the same URL",
+    "counter",
+    lambda: {("in_flight",): coalescer.stats["coalesced"], ("recent",): coalescer.stats["reused"]},
+    ("source",),
+)
+Callback("pulse_probe_host_waits_total", "Probes that waited for a per-host slot", "counter", lambda: coalescer.stats["host_waits"])
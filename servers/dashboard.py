@@ -0,0 +1,127 @@
+"""
+Dashboard data for one user: every monitor with its latest check, 24h uptime and an hourly
+latency sparkline, fetched in a single query. The latest check is one index probe per
+monitor (LATERAL ... LIMIT 1) and the 24h figures come from the hourly rollups, so the cost
+doesn't grow with check history. Results are cached per user for DASHBOARD_CACHE_SECONDS.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import outerjoin
+
+from app.config import settings
+from servers.models import ServerAnalytics, ServerRollup, UserServer
+from servers.rollups import HOUR, bucket_start
+
+SPARKLINE_HOURS = 24
+
+
+def dashboard_query(user_id: int, since: datetime):
+    latest = (
+        select(ServerAnalytics.created_at, ServerAnalytics.status_code, ServerAnalytics.latency_ms)
+        .where(ServerAnalytics.server_id == UserServer.id)
+        .order_by(ServerAnalytics.created_at.desc())
+        .limit(1)
+        .lateral("latest")
+    )
+    ok = ServerRollup.check_count - ServerRollup.error_count
+    hourly_avg = ServerRollup.latency_sum / func.nullif(ok, 0)
+    day = (
+        select(
+            func.sum(ServerRollup.check_count).label("checks"),
+            func.sum(ServerRollup.error_count).label("errors"),
+            func.array_agg(aggregate_order_by(ServerRollup.bucket_start, ServerRollup.bucket_start)).label("buckets"),
+            func.array_agg(aggregate_order_by(hourly_avg, ServerRollup.bucket_start)).label("latencies"),
+        )
+        .where(
+            ServerRollup.server_id == UserServer.id,
+            ServerRollup.resolution == HOUR,
+            ServerRollup.bucket_start >= since,
+        )
+        .lateral("day")
+    )
+    return (
+        select(
+            UserServer.id,
+            UserServer.server_name,
+            UserServer.server_url,
+            UserServer.interval_seconds,
+            UserServer.status,
+            latest.c.created_at,
+            latest.c.status_code,
+            latest.c.latency_ms,
+            day.c.checks,
+            day.c.errors,
+            day.c.buckets,
+            day.c.latencies,
+        )
+        .select_from(outerjoin(UserServer, latest, true()).outerjoin(day, true()))
+        .where(UserServer.user_id == user_id)
+        .order_by(UserServer.id)
+    )
+
+
+async def load_dashboard(db, user_id: int) -> List[dict]:
+    since = bucket_start(datetime.now(timezone.utc) - timedelta(hours=SPARKLINE_HOURS - 1), HOUR)
+    slots = [since + timedelta(hours=h) for h in range(SPARKLINE_HOURS)]
+    sites = []
+    for row in (await db.execute(dashboard_query(user_id, since))).all():
+        # one point per hour, None where there were no successful checks
+        by_hour = dict(zip(row.buckets or (), row.latencies or ()))
+        sparkline = [round(by_hour[s], 2) if by_hour.get(s) is not None else None for s in slots]
+        sites.append({
+            "id": row.id,
+            "server_name": row.server_name,
+            "server_url": row.server_url,
+            "interval_seconds": row.interval_seconds,
+            "status": row.status,
+            "last_checked_at": row.created_at.isoformat() if row.created_at else None,
+            "last_status_code": row.status_code,
+            "last_latency_ms": row.latency_ms,
+            "uptime_24h": round(100.0 * (row.checks - row.errors) / row.checks, 2) if row.checks else None,
+            "sparkline": sparkline,
+        })
+    return sites
+
+
+def sparkline_points(values: List[Optional[float]], width: int = 120, height: int = 24) -> str:
+    """SVG polyline points for a sparkline; gaps are skipped."""
+    present = [v for v in values if v is not None]
+    if not present:
+        return ""
+    peak = max(present) or 1.0
+    step = width / max(len(values) - 1, 1)
+    return " ".join(
+        f"{i * step:.1f},{height - (v / peak) * height:.1f}"
+        for i, v in enumerate(values) if v is not None
+    )
+
+
+class DashboardCache:
+    """Short-lived per-user cache, so a polling UI costs one query per user per TTL."""
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[int, Tuple[float, List[dict]]] = {}
+
+    async def get(self, db, user_id: int) -> List[dict]:
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        sites = await load_dashboard(db, user_id)
+        if len(self._entries) >= self.maxsize:
+            self._entries = {uid: e for uid, e in self._entries.items() if e[0] > now}
+        if len(self._entries) < self.maxsize:
+            self._entries[user_id] = (now + self.ttl, sites)
+        return sites
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+
+dashboard_cache = DashboardCache(settings.DASHBOARD_CACHE_SECONDS)
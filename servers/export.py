@@ -0,0 +1,114 @@
+"""
+Streaming export of raw check history as NDJSON or CSV.
+
+Rows are read through a server-side cursor (AsyncSession.stream + yield_per) and written
+out one chunk at a time, so memory stays flat however long the range is. Rows come in
+(server_id, created_at, id) order; to resume an interrupted download, pass the last row
+received back as cursor=<server_id>,<created_at>,<id> and the export continues right after it.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+
+from app.database import AsyncSessionLocal
+from servers.models import ServerAnalytics
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+COLUMNS = ("server_id", "id", "created_at", "status_code", "latency_ms", "dns_ms", "connect_ms", "tls_ms", "ttfb_ms")
+
+
+class ExportCursor(NamedTuple):
+    server_id: int
+    created_at: datetime
+    id: int
+
+    @classmethod
+    def parse(cls, value: str) -> "ExportCursor":
+        try:
+            server_id, created_at, row_id = value.split(",")
+            return cls(int(server_id), as_utc(datetime.fromisoformat(created_at)), int(row_id))
+        except ValueError:
+            raise ValueError("cursor must be <server_id>,<created_at>,<id> from the last row received")
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def server_query(server_id: int, start: Optional[datetime], end: Optional[datetime], cursor: Optional[ExportCursor]):
+    query = (
+        select(*(getattr(ServerAnalytics, c) for c in COLUMNS))
+        .where(ServerAnalytics.server_id == server_id)
+        .order_by(ServerAnalytics.created_at, ServerAnalytics.id)
+    )
+    if start is not None:
+        query = query.where(ServerAnalytics.created_at >= start)
+    if end is not None:
+        query = query.where(ServerAnalytics.created_at < end)
+    if cursor is not None and cursor.server_id == server_id:
+        query = query.where(tuple_(ServerAnalytics.created_at, ServerAnalytics.id) > tuple_(cursor.created_at, cursor.id))
+    return query
+
+
+def _encode(rows, fmt: str) -> bytes:
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for row in rows:
+            writer.writerow((
+                row.server_id, row.id, row.created_at.isoformat(), row.status_code, row.latency_ms,
+                row.dns_ms, row.connect_ms, row.tls_ms, row.ttfb_ms,
+            ))
+        return out.getvalue().encode()
+    return "".join(
+        json.dumps({
+            "server_id": row.server_id,
+            "id": row.id,
+            "created_at": row.created_at.isoformat(),
+            "status_code": row.status_code,
+            "latency_ms": row.latency_ms,
+            "dns_ms": row.dns_ms,
+            "connect_ms": row.connect_ms,
+            "tls_ms": row.tls_ms,
+            "ttfb_ms": row.ttfb_ms,
+        }) + "\n"
+        for row in rows
+    ).encode()
+
+
+async def export_rows(
+    server_ids: List[int],
+    fmt: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[ExportCursor] = None,
+    chunk_rows: int = 5000,
+) -> AsyncIterator[bytes]:
+    """Encoded chunks for the given servers, one server at a time in id order."""
+    if fmt == "csv" and cursor is None:
+        yield (",".join(COLUMNS) + "\n").encode()
+    # its own session: the request's session is closed by the time the body streams
+    async with AsyncSessionLocal() as db:
+        for server_id in sorted(server_ids):
+            if cursor is not None and server_id < cursor.server_id:
+                continue
+            query = server_query(server_id, start, end, cursor).execution_options(yield_per=chunk_rows)
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                yield _encode(rows, fmt)
+
+
+async def gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,289 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import httpcore
+import httpx
+
+from app.config import settings
+
+
+class DNSCache:
+    """
+    Caches resolved addresses per (host, port) for a fixed TTL. Expired entries are dropped
+    when looked up, and all of them once the cache holds max_entries; past that the oldest
+    entries give way.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # (host, port) -> (expires_at, ip)
+        self._entries: Dict[Tuple[str, int], Tuple[float, str]] = {}
+
+    async def resolve(self, host: str, port: int) -> str:
+        # IP literals never need a lookup
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+
+        key = (host, port)
+        now = time.monotonic()
+        cached = self._entries.get(key)
+        if cached:
+            if cached[0] > now:
+                return cached[1]
+            del self._entries[key]
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        ip = infos[0][4][0]
+        if self.ttl_seconds > 0:
+            self._store(key, now + self.ttl_seconds, ip)
+        return ip
+
+    def _store(self, key: Tuple[str, int], expires_at: float, ip: str):
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (expires_at, ip)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class PhaseTrace:
+    """
+    httpcore "trace" extension that times a request's phases with perf_counter. DNS isn't
+    an httpcore event: the network backend resolves inside connect_tcp and reports the
+    lookup through current_trace. Phases that didn't happen (a reused connection has no
+    connect or TLS) stay None.
+    """
+
+    def __init__(self):
+        self.dns_ms: Optional[float] = None
+        self._started: Dict[str, float] = {}
+        self._durations: Dict[str, float] = {}
+        self._request_sent: Optional[float] = None
+        self._first_byte: Optional[float] = None
+
+    async def __call__(self, event: str, info: dict):
+        now = time.perf_counter()
+        name, _, stage = event.rpartition(".")
+        phase = name.split(".", 1)[-1]  # "connection.connect_tcp" -> "connect_tcp"
+        if stage == "started":
+            self._started[phase] = now
+            if phase == "send_request_headers":
+                self._request_sent = now
+        elif stage == "complete" and phase in self._started:
+            self._durations[phase] = (now - self._started[phase]) * 1000
+            if phase == "receive_response_headers":
+                self._first_byte = now
+
+    @property
+    def connect_ms(self) -> Optional[float]:
+        connect = self._durations.get("connect_tcp")
+        if connect is None:
+            return None
+        return max(connect - (self.dns_ms or 0.0), 0.0)
+
+    @property
+    def tls_ms(self) -> Optional[float]:
+        return self._durations.get("start_tls")
+
+    @property
+    def ttfb_ms(self) -> Optional[float]:
+        if self._request_sent is None or self._first_byte is None:
+            return None
+        return (self._first_byte - self._request_sent) * 1000
+
+
+# set around a traced request, so the network backend can report the DNS lookup
+current_trace: ContextVar[Optional[PhaseTrace]] = ContextVar("current_trace", default=None)
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    Wraps httpcore's asyncio (AnyIO) backend and resolves hostnames through a DNSCache.
+    TLS still uses the original hostname for SNI/verification, since httpcore passes
+    the origin host to start_tls separately.
+    """
+
+    def __init__(self, dns_cache: DNSCache):
+        self._backend = httpcore.AnyIOBackend()
+        self._dns_cache = dns_cache
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        started = time.perf_counter()
+        ip = await self._dns_cache.resolve(host, port)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.dns_ms = (time.perf_counter() - started) * 1000
+        return await self._backend.connect_tcp(
+            ip,
+            port,
+            timeout=timeout,
+            local_address=local_address,
+            socket_options=socket_options,
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+# httpcore exception -> the httpx exception raised in its place, as httpx's own transport does
+_EXCEPTIONS = {
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+    httpcore.ProtocolError: httpx.ProtocolError,
+}
+
+
+@contextmanager
+def _httpx_exceptions():
+    try:
+        yield
+    except Exception as e:
+        for cls in type(e).__mro__:
+            if cls in _EXCEPTIONS:
+                raise _EXCEPTIONS[cls](str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        with _httpx_exceptions():
+            async for chunk in self._stream:
+                yield chunk
+
+    async def aclose(self):
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+
+class PingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport over an httpcore connection pool with a custom network backend, which
+    httpx's own AsyncHTTPTransport doesn't accept. Only uses the public httpx/httpcore APIs.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool, network_backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=network_backend,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_exceptions():
+            response = await self._pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._pool.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Build the long-lived client used for all checks.
+
+    "warm" mode reuses pooled keep-alive connections and cached DNS, so the recorded
+    latency is roughly the request/response time on an established connection.
+    "cold" mode disables keep-alive and the DNS cache, so every check pays for
+    DNS + TCP + TLS like a first-time visitor would. Both go through
+    CachingNetworkBackend (with a zero TTL when cold), so DNS time is measured either way.
+    """
+    cold = settings.PING_LATENCY_MODE == "cold"
+
+    http2 = settings.HTTP2_ENABLED
+    if http2 and not _http2_available():
+        print("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=0 if cold else settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    network_backend = CachingNetworkBackend(DNSCache(0 if cold else settings.DNS_CACHE_TTL_SECONDS))
+
+    return httpx.AsyncClient(
+        transport=PingTransport(limits=limits, http2=http2, network_backend=network_backend),
+        timeout=settings.PING_TIMEOUT_SECONDS,
+    )
+
+
+http_client: Optional[httpx.AsyncClient] = None
+
+
+async def start_http_client():
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    if http_client is None:
+        raise RuntimeError("HTTP client not started, call start_http_client() first")
+    return http_client
@@ -0,0 +1,152 @@
+"""
+Monitor status transitions and the incident log.
+
+The worker keeps each monitor's current status in memory (StatusTracker) and only writes
+when it changes: user_servers.status is updated, and a server_incidents row is opened when a
+monitor goes down and closed, with its duration, when it comes back. A check that confirms
+the known status writes nothing, so user_servers isn't rewritten on every check.
+
+On startup the worker seeds the tracker from each monitor's last recorded check. A monitor
+the tracker has no status for (no history yet, taken over from another worker, or after a
+failed write) has its first check counted as a transition anyway, but isn't alerted on. Those
+writes are idempotent: the status UPDATE only matches rows whose status differs, opening an
+incident is a no-op while one is open, and closing one is a no-op when none is.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, bindparam, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from servers.models import ServerIncident, ServerStatus, UserServer
+from servers.rollups import WINDOWS
+
+# (server_id, new status, checked_at, status_code)
+Transition = Tuple[int, str, datetime, int]
+
+
+class StatusTracker:
+    def __init__(self):
+        self._status: Dict[int, str] = {}
+
+    def get(self, server_id: int) -> Optional[str]:
+        return self._status.get(server_id)
+
+    def warm(self, status_codes: Dict[int, int]):
+        """Start from each monitor's last recorded check, so the first check after a restart is a real transition or none."""
+        for server_id, status_code in status_codes.items():
+            self.observe(server_id, status_code)
+
+    def observe(self, server_id: int, status_code: int) -> Optional[str]:
+        """The monitor's new status if this check changed it (or it was unknown), else None."""
+        status = ServerStatus.ACTIVE.value if status_code == 200 else ServerStatus.INACTIVE.value
+        if self._status.get(server_id) == status:
+            return None
+        self._status[server_id] = status
+        return status
+
+    def forget(self, server_ids: Iterable[int]):
+        """Make the next check of these monitors write their status again, e.g. after a failed write."""
+        for server_id in server_ids:
+            self._status.pop(server_id, None)
+
+    def discard(self, server_id: int):
+        self._status.pop(server_id, None)
+
+
+status_tracker = StatusTracker()
+
+
+_incidents = ServerIncident.__table__
+_servers = UserServer.__table__
+
+# executemany statements, bound with the b_* parameters of transition_params()
+_at = bindparam("b_at", type_=DateTime(timezone=True))
+update_status = (
+    update(_servers)
+    .where(_servers.c.id == bindparam("b_id"), _servers.c.status.is_distinct_from(bindparam("b_status")))
+    # updated_at tracks config edits, which the monitor registry syncs on
+    .values(status=bindparam("b_status"), updated_at=_servers.c.updated_at)
+)
+open_incident = (
+    pg_insert(_incidents)
+    .values(server_id=bindparam("b_id"), started_at=_at, status_code=bindparam("b_code"))
+    .on_conflict_do_nothing(index_elements=["server_id"], index_where=_incidents.c.ended_at.is_(None))
+)
+close_incident = (
+    update(_incidents)
+    .where(_incidents.c.server_id == bindparam("b_id"), _incidents.c.ended_at.is_(None))
+    .values(
+        ended_at=_at,
+        duration_seconds=func.extract("epoch", _at - _incidents.c.started_at),
+    )
+)
+
+
+def transition_params(transition: Transition) -> dict:
+    server_id, status, checked_at, status_code = transition
+    return {"b_id": server_id, "b_status": status, "b_at": checked_at, "b_code": status_code}
+
+
+async def write_transitions(db, transitions: List[Transition]):
+    """Apply transitions in order, batching consecutive opens or closes into one executemany."""
+    if not transitions:
+        return
+    latest = {t[0]: transition_params(t) for t in transitions}
+    await db.execute(update_status, list(latest.values()))
+
+    run: List[dict] = []
+    run_status = None
+    for transition in transitions:
+        if transition[1] != run_status and run:
+            await db.execute(close_incident if run_status == ServerStatus.ACTIVE.value else open_incident, run)
+            run = []
+        run_status = transition[1]
+        run.append(transition_params(transition))
+    await db.execute(close_incident if run_status == ServerStatus.ACTIVE.value else open_incident, run)
+
+
+async def incident_summary(db, server_id: int, window: str, created_at: Optional[datetime] = None) -> dict:
+    """
+    Incidents overlapping the last 1h/24h/7d/30d/90d and time-based uptime over that window,
+    read from server_incidents only. The window starts no earlier than the monitor's creation.
+    """
+    length, _ = WINDOWS[window]
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(seconds=length)
+    if created_at is not None:
+        since = max(since, created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc))
+
+    incidents = (await db.scalars(
+        select(ServerIncident)
+        .where(
+            ServerIncident.server_id == server_id,
+            ServerIncident.started_at < now,
+            or_(ServerIncident.ended_at.is_(None), ServerIncident.ended_at > since),
+        )
+        .order_by(ServerIncident.started_at.desc())
+    )).all()
+
+    downtime = 0.0
+    for incident in incidents:
+        start = max(incident.started_at, since)
+        end = min(incident.ended_at or now, now)
+        downtime += max((end - start).total_seconds(), 0.0)
+    covered = (now - since).total_seconds()
+
+    return {
+        "window": window,
+        "uptime_percent": round(100.0 * (1 - downtime / covered), 3) if covered > 0 else None,
+        "downtime_seconds": round(downtime, 1),
+        "incident_count": len(incidents),
+        "open": any(i.ended_at is None for i in incidents),
+        "incidents": [
+            {
+                "started_at": i.started_at.isoformat(),
+                "ended_at": i.ended_at.isoformat() if i.ended_at else None,
+                "duration_seconds": round(i.duration_seconds, 1) if i.duration_seconds is not None else None,
+                "status_code": i.status_code,
+            }
+            for i in incidents
+        ],
+    }
@@ -1,7 +1,8 @@
 from enum import Enum
 from sqlalchemy.sql import func
 from app.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Float, Index, UniqueConstraint, false, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
 
@@ -9,6 +10,12 @@ class ServerStatus(str, Enum):
     ACTIVE = "active"
     INACTIVE = "inactive"
 
+class CheckType(str, Enum):
+    GET = "get"  # GET, reading at most PING_MAX_BODY_BYTES of the body
+    HEAD = "head"
+    TCP = "tcp"  # connect to the URL's host and port only
+    DNS = "dns"  # resolve the URL's host only
+
 class UserServer(Base):
     __tablename__ = "user_servers"
 
@@ -20,6 +27,16 @@ class UserServer(Base):
     status = Column(String, default=ServerStatus.ACTIVE.value)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # adaptive mode: back off towards max_interval_seconds while stable, tighten after a change
+    adaptive = Column(Boolean, nullable=False, default=False, server_default=false())
+    max_interval_seconds = Column(Integer, nullable=True)
+    check_type = Column(String, nullable=False, default=CheckType.GET.value, server_default=CheckType.GET.value)
+    # client-supplied id that makes bulk imports idempotent
+    external_key = Column(String, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "external_key", name="uq_user_servers_user_id_external_key"),
+    )
 
 
 class ServerAnalytics(Base):
@@ -30,4 +47,81 @@ class ServerAnalytics(Base):
     status_code = Column(Integer)
     latency_ms = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # phase breakdown of latency_ms; None for phases the check didn't go through
+    dns_ms = Column(Float)
+    connect_ms = Column(Float)
+    tls_ms = Column(Float)
+    ttfb_ms = Column(Float)
+
+    __table_args__ = (
+        # get_analytics and friends filter by server and read the newest rows first
+        Index("ix_server_analytics_server_id_created_at", "server_id", created_at.desc()),
+    )
+
+
+class ServerRollup(Base):
+    __tablename__ = "server_rollups"
+
+    server_id = Column(Integer, ForeignKey("user_servers.id", ondelete="CASCADE"), primary_key=True)
+    resolution = Column(Integer, primary_key=True)  # bucket width in seconds: 60, 3600 or 86400
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    check_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    # latency figures cover successful checks only
+    latency_min = Column(Float)
+    latency_max = Column(Float)
+    latency_sum = Column(Float, nullable=False, default=0.0)
+    latency_sketch = Column(JSONB, nullable=False, default=dict)  # servers.rollups.LatencySketch counts
+
+
+class ServerIncident(Base):
+    """One outage of a monitor, opened on the first failing check and closed on recovery."""
+    __tablename__ = "server_incidents"
+
+    id = Column(Integer, primary_key=True)
+    server_id = Column(Integer, ForeignKey("user_servers.id", ondelete="CASCADE"), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    ended_at = Column(DateTime(timezone=True), nullable=True)  # None while still down
+    duration_seconds = Column(Float, nullable=True)
+    status_code = Column(Integer)  # of the check that opened the incident, 0 when unreachable
+
+    __table_args__ = (
+        Index("ix_server_incidents_server_id_started_at", "server_id", started_at.desc()),
+        # at most one open incident per monitor
+        Index("uq_server_incidents_open", "server_id", unique=True, postgresql_where=text("ended_at IS NULL")),
+    )
+
+
+class AlertDestination(Base):
+    """A webhook that receives a user's status-change alerts."""
+    __tablename__ = "alert_destinations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    enabled = Column(Boolean, nullable=False, default=True, server_default=text("true"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AlertDeadLetter(Base):
+    """A delivery that still failed after ALERT_MAX_ATTEMPTS, kept for inspection."""
+    __tablename__ = "alert_dead_letters"
+
+    id = Column(Integer, primary_key=True)
+    destination_id = Column(Integer, ForeignKey("alert_destinations.id", ondelete="CASCADE"), nullable=False, index=True)
+    payload = Column(JSONB, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MonitorWorker(Base):
+    """A running monitoring worker; monitors are sharded over the rows with a fresh heartbeat."""
+    __tablename__ = "monitor_workers"
 
+    worker_id = Column(String, primary_key=True)
+    hostname = Column(String)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    # written with the database clock, so workers on different hosts agree on liveness
+    heartbeat_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
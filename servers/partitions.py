@@ -0,0 +1,172 @@
+"""
+Time-range partition maintenance for server_analytics.
+
+Partitioning is opt-in: the server_analytics index migration converts the table when run with
+-x partitioning=daily|monthly, and ANALYTICS_PARTITIONING tells the worker which one it is. Once the table is partitioned, the worker keeps
+ANALYTICS_PARTITIONS_AHEAD partitions created in advance, and drops whole partitions older
+than ANALYTICS_RETENTION_DAYS instead of running large DELETEs.
+
+Run a maintenance pass by hand with: python -m servers.partitions
+"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.database import async_engine, engine
+
+TABLE = "server_analytics"
+DEFAULT_PARTITION = f"{TABLE}_default"
+GRANULARITIES = ("daily", "monthly")
+
+# how often the worker runs a maintenance pass
+MAINTENANCE_INTERVAL_SECONDS = 3600
+
+
+def period_start(day: date, granularity: str) -> date:
+    return day if granularity == "daily" else day.replace(day=1)
+
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "daily":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(start: date, granularity: str) -> str:
+    suffix = start.strftime("%Y%m%d") if granularity == "daily" else start.strftime("%Y%m")
+    return f"{TABLE}_p{suffix}"
+
+
+def parse_partition_name(name: str, granularity: str) -> Optional[date]:
+    prefix = f"{TABLE}_p"
+    if not name.startswith(prefix):
+        return None
+    fmt = "%Y%m%d" if granularity == "daily" else "%Y%m"
+    try:
+        return datetime.strptime(name[len(prefix):], fmt).date()
+    except ValueError:
+        return None
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {"table": TABLE}).scalar())
+
+
+def existing_partitions(conn: Connection, granularity: str) -> List[Tuple[str, date]]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+    ), {"table": TABLE}).scalars()
+    partitions = []
+    for name in rows:
+        start = parse_partition_name(name, granularity)
+        if start is not None:
+            partitions.append((name, start))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partitions(conn: Connection, granularity: str, first: date, last: date) -> int:
+    """
+    Create every missing partition whose range overlaps [first, last].
+
+    Postgres refuses to create a partition while the default partition holds rows in its
+    range (rows written while maintenance was behind). Those rows are moved: the default
+    partition is detached, the new partition created, the rows copied over and deleted from
+    the default, and the default attached again, all in the caller's transaction.
+    """
+    created = 0
+    start = period_start(first, granularity)
+    while start <= last:
+        end = next_period(start, granularity)
+        name = partition_name(start, granularity)
+        exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+        if not exists:
+            lower, upper = f"{start.isoformat()} 00:00:00+00", f"{end.isoformat()} 00:00:00+00"
+            in_range = f"created_at >= '{lower}' AND created_at < '{upper}'"
+            stranded = has_default_partition(conn) and conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"
+            )).scalar()
+            if stranded:
+                conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}"))
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+            if stranded:
+                columns = ", ".join(table_columns(conn))
+                conn.execute(text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+                moved = conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}")).rowcount
+                conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+                print(f"Analytics partitions: moved {moved} rows from {DEFAULT_PARTITION} into {name}")
+            created += 1
+        start = end
+    return created
+
+
+def has_default_partition(conn: Connection) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table AND pt.partdefid <> 0)"
+    ), {"table": TABLE}).scalar())
+
+
+def table_columns(conn: Connection) -> List[str]:
+    return list(conn.execute(text(
+        "SELECT attname FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) "
+        "AND attnum > 0 AND NOT attisdropped ORDER BY attnum"
+    ), {"table": TABLE}).scalars())
+
+
+def drop_partitions_before(conn: Connection, granularity: str, cutoff: date) -> int:
+    """Drop partitions whose whole range ends on or before cutoff."""
+    dropped = 0
+    for name, start in existing_partitions(conn, granularity):
+        if next_period(start, granularity) <= cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped += 1
+    return dropped
+
+
+def maintain_partitions(conn: Connection) -> Tuple[int, int]:
+    """Create upcoming partitions and drop expired ones. Returns (created, dropped)."""
+    granularity = settings.ANALYTICS_PARTITIONING
+    if granularity not in GRANULARITIES or not is_partitioned(conn):
+        return 0, 0
+
+    today = datetime.now(timezone.utc).date()
+    last = today
+    for _ in range(settings.ANALYTICS_PARTITIONS_AHEAD):
+        last = next_period(period_start(last, granularity), granularity)
+    created = create_partitions(conn, granularity, today, last)
+
+    dropped = 0
+    if settings.ANALYTICS_RETENTION_DAYS > 0:
+        cutoff = today - timedelta(days=settings.ANALYTICS_RETENTION_DAYS)
+        dropped = drop_partitions_before(conn, granularity, cutoff)
+    return created, dropped
+
+
+async def partition_maintenance_loop(is_leader: Callable[[], bool] = lambda: True):
+    while True:
+        try:
+            if is_leader():
+                async with async_engine.begin() as conn:
+                    created, dropped = await conn.run_sync(maintain_partitions)
+                if created or dropped:
+                    print(f"Analytics partitions: {created} created, {dropped} dropped")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Analytics partition maintenance failed: {e!r}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    with engine.begin() as conn:
+        created, dropped = maintain_partitions(conn)
+    print(f"Analytics partitions: {created} created, {dropped} dropped")
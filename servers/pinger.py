@@ -1,35 +1,31 @@
-import httpx
 import time
+from typing import Optional
+from servers.alerts import alert_dispatcher
+from servers.analytics_writer import analytics_writer
+from servers.coalesce import coalescer
+from servers.incidents import status_tracker
+from servers.recent import recent_checks
 from servers.websocket_manager import manager
-from servers.models import ServerAnalytics, ServerStatus
 
-async def perform_ping(db, server):
-    start_time = time.time()
+async def perform_ping(server, timeout: Optional[float] = None) -> int:
+    """Check one server and publish the result; returns the status code (0 when unreachable)."""
+    # monitors on the same URL share the request, each still records its own check
+    status, latency, checked_at, timings = await coalescer.check(server.server_url, timeout, server.check_type)
 
-    # Perform the HTTP request to check server status
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(server.server_url, timeout=10.0)
-            status = response.status_code
-    except Exception:
-        status = 0 # Down
-    
-    latency = round((time.time() - start_time) * 1000, 2)
+    # 1. Queue the analytics row, plus the status change if there is one; the writer saves them in bulk
+    previous = status_tracker.get(server.id)
+    transition = status_tracker.observe(server.id, status)
+    await analytics_writer.submit(server.id, status, latency, transition, checked_at, timings)
+    if transition is not None and previous is not None:
+        # queued only; delivery happens in the background
+        alert_dispatcher.notify(server, transition, status, checked_at)
+    recent_checks.record(server.id, checked_at, status, latency)
 
-    # 1. Update Server Status in Database
-    server.status = ServerStatus.ACTIVE.value if status == 200 else ServerStatus.INACTIVE.value
-    server.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
-    db.add(server)
-
-    # 2. Save Analytics to Database
-    new_check = ServerAnalytics(server_id=server.id, status_code=status, latency_ms=latency)
-    db.add(new_check)
-    db.commit()
-    
-
-    # 3. Broadcast Live to WebSockets
+    # 2. Broadcast Live to WebSockets
     await manager.broadcast_to_server(server.id, {
         "status": status,
         "latency": latency,
+        "phases": timings._asdict(),
         "timestamp": time.strftime("%H:%M:%S")
     })
+    return status
@@ -0,0 +1,118 @@
+"""
+The check types a monitor can use (UserServer.check_type):
+
+    get   GET, reading at most PING_MAX_BODY_BYTES of the body before hanging up
+    head  HEAD, no body at all
+    tcp   connect to the URL's host and port, then close
+    dns   resolve the URL's host
+
+HTTP checks report the response status. tcp and dns checks have no status, so they record
+200 when they succeed and 0 when they don't, the same codes the rest of the app reads as
+up and down. Every check is timed with perf_counter and broken down into DNS, connect,
+TLS and time-to-first-byte wherever the check went through that phase.
+"""
+import asyncio
+import socket
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+from app.metrics import Counter, Histogram
+from servers.http_client import PhaseTrace, current_trace, get_http_client
+from servers.models import CheckType
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+PROBE_SECONDS = Histogram("pulse_probe_duration_seconds", "Probe latency by check type", ("check_type",))
+PROBE_ERRORS = Counter("pulse_probe_errors_total", "Probes that failed to get an answer, by check type and error", ("check_type", "error"))
+
+
+class PhaseTimings(NamedTuple):
+    dns_ms: Optional[float] = None
+    connect_ms: Optional[float] = None
+    tls_ms: Optional[float] = None
+    ttfb_ms: Optional[float] = None
+
+
+class ProbeResult(NamedTuple):
+    status: int  # 0 when unreachable
+    latency_ms: float
+    checked_at: datetime
+    timings: PhaseTimings
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+async def probe(url: str, check_type: str = CheckType.GET.value, timeout: Optional[float] = None) -> ProbeResult:
+    started = time.perf_counter()
+    if check_type in (CheckType.TCP.value, CheckType.DNS.value):
+        status, timings = await _socket_check(url, check_type, timeout or settings.PING_TIMEOUT_SECONDS)
+    else:
+        status, timings = await _http_check(url, check_type, timeout)
+    elapsed = time.perf_counter() - started
+    PROBE_SECONDS.labels(check_type).observe(elapsed)
+    latency = round(elapsed * 1000, 2)
+    return ProbeResult(status, latency, datetime.now(timezone.utc), timings)
+
+
+async def _http_check(url: str, check_type: str, timeout: Optional[float]):
+    client = get_http_client()
+    trace = PhaseTrace()
+    token = current_trace.set(trace)
+    # a shorter timeout is only passed for targets already known to be down
+    options = {"timeout": timeout} if timeout is not None else {}
+    try:
+        if check_type == CheckType.HEAD.value:
+            response = await client.head(url, extensions={"trace": trace}, **options)
+        else:
+            async with client.stream("GET", url, extensions={"trace": trace}, **options) as response:
+                read = 0
+                # raw bytes, no decompression; leaving early closes rather than reuses the connection
+                async for chunk in response.aiter_raw():
+                    read += len(chunk)
+                    if read >= settings.PING_MAX_BODY_BYTES:
+                        break
+        status = response.status_code
+    except Exception as e:
+        PROBE_ERRORS.labels(check_type, type(e).__name__).inc()
+        status = 0  # Down
+    finally:
+        current_trace.reset(token)
+    return status, PhaseTimings(_ms(trace.dns_ms), _ms(trace.connect_ms), _ms(trace.tls_ms), _ms(trace.ttfb_ms))
+
+
+async def _socket_check(url: str, check_type: str, timeout: float):
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    try:
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme.lower(), 80)
+    except ValueError:
+        return 0, PhaseTimings()
+
+    loop = asyncio.get_running_loop()
+    dns_ms = connect_ms = None
+    try:
+        async with asyncio.timeout(timeout):
+            started = time.perf_counter()
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            dns_ms = (time.perf_counter() - started) * 1000
+            if check_type == CheckType.TCP.value:
+                started = time.perf_counter()
+                _, writer = await asyncio.open_connection(infos[0][4][0], port)
+                try:
+                    connect_ms = (time.perf_counter() - started) * 1000
+                finally:
+                    writer.close()
+                    try:
+                        await writer.wait_closed()
+                    except OSError:
+                        pass  # the connect succeeded; a reset while closing doesn't matter
+        status = 200
+    except Exception as e:
+        PROBE_ERRORS.labels(check_type, type(e).__name__).inc()
+        status = 0
+    return status, PhaseTimings(_ms(dns_ms), _ms(connect_ms))
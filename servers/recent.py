@@ -0,0 +1,125 @@
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import select, true
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from servers.models import ServerAnalytics, UserServer
+
+
+class RecentCheck(NamedTuple):
+    # same attribute names as ServerAnalytics, so templates can render either
+    created_at: datetime
+    status_code: int
+    latency_ms: float
+
+
+class RecentChecks:
+    """
+    Fixed-size ring buffer of one monitor's latest checks, stored column-wise in typed
+    arrays (8 + 2 + 4 bytes per check), so memory per monitor never grows past `depth`.
+    """
+
+    __slots__ = ("depth", "timestamps", "status_codes", "latencies", "_next", "_count")
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.timestamps = array("d", [0.0]) * depth  # epoch seconds
+        self.status_codes = array("H", [0]) * depth
+        self.latencies = array("f", [0.0]) * depth
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp: float, status_code: int, latency_ms: float):
+        i = self._next
+        self.timestamps[i] = timestamp
+        self.status_codes[i] = status_code
+        self.latencies[i] = latency_ms
+        self._next = (i + 1) % self.depth
+        if self._count < self.depth:
+            self._count += 1
+
+    def last_timestamp(self) -> Optional[float]:
+        return self.timestamps[(self._next - 1) % self.depth] if self._count else None
+
+    def latest(self, limit: Optional[int] = None) -> List[RecentCheck]:
+        """Newest first."""
+        n = self._count if limit is None else min(limit, self._count)
+        checks = []
+        for k in range(1, n + 1):
+            i = (self._next - k) % self.depth
+            checks.append(RecentCheck(
+                datetime.fromtimestamp(self.timestamps[i], tz=timezone.utc),
+                self.status_codes[i],
+                round(self.latencies[i], 2),
+            ))
+        return checks
+
+
+class RecentStore:
+    """Ring buffers for every monitor this process checks, fed by perform_ping."""
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self._buffers: Dict[int, RecentChecks] = {}
+
+    def __contains__(self, server_id: int):
+        return server_id in self._buffers
+
+    def record(self, server_id: int, checked_at: datetime, status_code: int, latency_ms: float):
+        buffer = self._buffers.get(server_id)
+        if buffer is None:
+            buffer = self._buffers[server_id] = RecentChecks(self.depth)
+        buffer.append(checked_at.timestamp(), status_code, latency_ms)
+
+    def latest(self, server_id: int, limit: Optional[int] = None) -> Optional[List[RecentCheck]]:
+        """Newest-first checks, or None when this process has no history for the server."""
+        buffer = self._buffers.get(server_id)
+        return buffer.latest(limit) if buffer is not None else None
+
+    def last_checked(self, server_id: int) -> Optional[float]:
+        """Epoch seconds of the server's latest check, or None without history."""
+        buffer = self._buffers.get(server_id)
+        return buffer.last_timestamp() if buffer is not None else None
+
+    def discard(self, server_id: int):
+        self._buffers.pop(server_id, None)
+
+    async def warm(self, server_ids: Optional[Iterable[int]] = None):
+        """Load the last `depth` checks of each server, one index range scan per server."""
+        latest = (
+            select(ServerAnalytics.created_at, ServerAnalytics.status_code, ServerAnalytics.latency_ms)
+            .where(ServerAnalytics.server_id == UserServer.id)
+            .order_by(ServerAnalytics.created_at.desc())
+            .limit(self.depth)
+            .lateral()
+        )
+        query = (
+            select(UserServer.id, latest.c.created_at, latest.c.status_code, latest.c.latency_ms)
+            .join(latest, true())
+            .order_by(UserServer.id, latest.c.created_at)
+        )
+        if server_ids is not None:
+            query = query.where(UserServer.id.in_(list(server_ids)))
+
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+
+        # oldest first per server, so the ring ends on the newest
+        loaded: Dict[int, RecentChecks] = {}
+        for server_id, created_at, status_code, latency_ms in rows:
+            if created_at is None:
+                continue
+            buffer = loaded.get(server_id)
+            if buffer is None:
+                buffer = loaded[server_id] = RecentChecks(self.depth)
+            buffer.append(created_at.timestamp(), status_code or 0, latency_ms or 0.0)
+        self._buffers.update(loaded)
+
+
+recent_checks = RecentStore(settings.RECENT_CHECKS_DEPTH)
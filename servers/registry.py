@@ -0,0 +1,240 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from servers.models import CheckType, UserServer
+
+# Postgres channel used to tell other processes about monitor changes
+MONITOR_CHANNEL = "pulse_monitors"
+
+# Rows committed slightly out of order can carry an updated_at just below the watermark,
+# so every delta query looks back a little further. Re-applying a row is harmless.
+SYNC_OVERLAP = timedelta(seconds=10)
+
+
+class MonitorSpec:
+    """The parts of a UserServer the worker needs, detached from any session."""
+
+    __slots__ = ("id", "user_id", "server_name", "server_url", "interval_seconds", "adaptive", "max_interval_seconds", "check_type")
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        server_name: str,
+        server_url: str,
+        interval_seconds: Optional[int],
+        adaptive: Optional[bool] = False,
+        max_interval_seconds: Optional[int] = None,
+        check_type: Optional[str] = None,
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.server_name = server_name
+        self.server_url = server_url
+        self.interval_seconds = interval_seconds or 60
+        self.adaptive = bool(adaptive)
+        self.max_interval_seconds = max_interval_seconds
+        self.check_type = check_type or CheckType.GET.value
+
+    @classmethod
+    def from_server(cls, server: UserServer) -> "MonitorSpec":
+        return cls(**{name: getattr(server, name) for name in cls.__slots__})
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MonitorSpec":
+        # .get: events from processes running older code lack the newer fields
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, MonitorSpec) and self.to_dict() == other.to_dict()
+
+
+Listener = Callable[[str, int, Optional[MonitorSpec]], None]
+
+
+class MonitorRegistry:
+    """
+    In-memory copy of every monitor, loaded once and then kept current by change events.
+
+    Events come from the API routes in this process (apply()), from other processes via
+    Postgres LISTEN/NOTIFY, and as a fallback from a periodic `updated_at > watermark`
+    delta query plus an occasional id-only scan to catch deletes that were missed.
+    Listeners are called with ("upsert", id, spec) or ("delete", id, None).
+    """
+
+    def __init__(self):
+        self.monitors: Dict[int, MonitorSpec] = {}
+        self._listeners: List[Listener] = []
+        self._watermark: Optional[datetime] = None
+        # reload tasks started from NOTIFY callbacks; the loop only keeps weak references
+        self._tasks: Set[asyncio.Task] = set()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self.monitors)
+
+    def get(self, server_id: int) -> Optional[MonitorSpec]:
+        return self.monitors.get(server_id)
+
+    def subscribe(self, listener: Listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def apply(self, action: str, server_id: int, spec: Optional[MonitorSpec] = None):
+        if action == "delete":
+            if self.monitors.pop(server_id, None) is None:
+                return
+        else:
+            if self.monitors.get(server_id) == spec:
+                return
+            self.monitors[server_id] = spec
+
+        for listener in self._listeners:
+            try:
+                listener(action, server_id, spec)
+            except Exception as e:
+                print(f"Monitor registry listener failed: {e!r}")
+
+    def _advance_watermark(self, updated_at: Optional[datetime]):
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    async def load(self):
+        """Full load, done once at startup."""
+        async with AsyncSessionLocal() as db:
+            servers = (await db.scalars(select(UserServer))).all()
+        for server in servers:
+            self.apply("upsert", server.id, MonitorSpec.from_server(server))
+            self._advance_watermark(server.updated_at)
+        self.loaded = True
+
+    async def sync(self, reconcile: bool = False):
+        """Apply rows changed since the watermark; with reconcile, also drop deleted ids."""
+        query = select(UserServer)
+        if self._watermark is not None:
+            query = query.where(UserServer.updated_at > self._watermark - SYNC_OVERLAP)
+
+        async with AsyncSessionLocal() as db:
+            changed = (await db.scalars(query)).all()
+            ids = set(await db.scalars(select(UserServer.id))) if reconcile else None
+
+        for server in changed:
+            self.apply("upsert", server.id, MonitorSpec.from_server(server))
+            self._advance_watermark(server.updated_at)
+        if ids is not None:
+            for server_id in set(self.monitors) - ids:
+                self.apply("delete", server_id)
+
+    async def reload(self, server_ids: Iterable[int]):
+        """Re-read specific monitors in one query; ids that no longer exist are deleted."""
+        server_ids = set(server_ids)
+        async with AsyncSessionLocal() as db:
+            servers = (await db.scalars(select(UserServer).where(UserServer.id.in_(server_ids)))).all()
+        for server in servers:
+            self.apply("upsert", server.id, MonitorSpec.from_server(server))
+            self._advance_watermark(server.updated_at)
+        for server_id in server_ids - {server.id for server in servers}:
+            self.apply("delete", server_id)
+
+    async def _reload_quietly(self, server_ids: List[int]):
+        try:
+            await self.reload(server_ids)
+        except Exception as e:
+            # the periodic delta sync will pick these up
+            print(f"Monitor reload failed: {e!r}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+            if event["action"] == "reload":
+                task = asyncio.create_task(self._reload_quietly(event["ids"]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                return
+            action, server_id = event["action"], event["id"]
+            spec = MonitorSpec.from_dict(event["monitor"]) if action != "delete" else None
+        except Exception as e:
+            print(f"Ignoring malformed monitor event: {e!r}")
+            return
+        self.apply(action, server_id, spec)
+
+    async def run(self):
+        """
+        Listen for NOTIFY events and run the periodic delta sync until cancelled. The LISTEN
+        connection is checked on every sync pass, and a termination reported by asyncpg wakes
+        the loop right away, so it reconnects (and catches up) without waiting out the pass.
+        """
+        reconcile_every = max(1, int(settings.MONITOR_RECONCILE_SECONDS // settings.MONITOR_SYNC_SECONDS))
+        passes = 0
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    listener_conn = raw.driver_connection
+                    terminated = asyncio.Event()
+                    on_terminated = lambda connection: terminated.set()
+                    await listener_conn.add_listener(MONITOR_CHANNEL, self._on_notify)
+                    listener_conn.add_termination_listener(on_terminated)
+                    try:
+                        # catch up on anything missed while we were not listening
+                        await self.sync(reconcile=True)
+                        while not listener_conn.is_closed():
+                            try:
+                                await asyncio.wait_for(terminated.wait(), timeout=settings.MONITOR_SYNC_SECONDS)
+                                break
+                            except asyncio.TimeoutError:
+                                pass
+                            # a dead socket isn't always noticed until something is sent on it
+                            await listener_conn.execute("SELECT 1")
+                            passes += 1
+                            await self.sync(reconcile=passes % reconcile_every == 0)
+                    finally:
+                        if not listener_conn.is_closed():
+                            listener_conn.remove_termination_listener(on_terminated)
+                            await listener_conn.remove_listener(MONITOR_CHANNEL, self._on_notify)
+                    if listener_conn.is_closed():
+                        # don't hand a dead connection back to the pool; reconnect right away
+                        await conn.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Monitor registry sync failed, retrying: {e!r}")
+                await asyncio.sleep(settings.MONITOR_SYNC_SECONDS)
+
+
+async def publish_monitor_change(db, action: str, server: UserServer):
+    """
+    Queue a NOTIFY for a created/edited/deleted monitor inside the caller's transaction,
+    so other processes only hear about it once the change is committed. Call
+    registry.apply() after the commit to update this process right away.
+    """
+    event = {"action": action, "id": server.id}
+    if action != "delete":
+        event["monitor"] = MonitorSpec.from_server(server).to_dict()
+    await db.execute(select(func.pg_notify(MONITOR_CHANNEL, json.dumps(event))))
+
+
+# ids per reload event; keeps the NOTIFY payload well under Postgres' 8000 byte limit
+RELOAD_CHUNK = 500
+
+
+async def publish_monitor_reload(db, server_ids: List[int]):
+    """Like publish_monitor_change for many monitors at once: listeners re-read the ids."""
+    for i in range(0, len(server_ids), RELOAD_CHUNK):
+        event = {"action": "reload", "ids": server_ids[i:i + RELOAD_CHUNK]}
+        await db.execute(select(func.pg_notify(MONITOR_CHANNEL, json.dumps(event))))
+
+
+registry = MonitorRegistry()
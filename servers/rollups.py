@@ -0,0 +1,280 @@
+"""
+Per-server latency/uptime rollups at 1-minute, 1-hour and 1-day resolution.
+
+The analytics writer folds every flushed batch into these rows, so a "last 24h / 7d / 90d"
+summary reads a bounded number of buckets no matter how many checks ran. Percentiles come
+from a mergeable log-bucketed sketch, which is why buckets can be combined exactly.
+
+Rebuild rollups from raw analytics with: python -m servers.rollups backfill [--server-id N] [--until-now]
+"""
+import argparse
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from servers.models import ServerAnalytics, ServerRollup
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+# window name -> (length in seconds, rollup resolution used to answer it)
+WINDOWS = {
+    "1h": (HOUR, MINUTE),
+    "24h": (DAY, HOUR),
+    "7d": (7 * DAY, HOUR),
+    "30d": (30 * DAY, DAY),
+    "90d": (90 * DAY, DAY),
+}
+
+
+def is_error(status_code: Optional[int]) -> bool:
+    return status_code != 200
+
+
+class LatencySketch:
+    """
+    Log-bucketed latency histogram (DDSketch-style). Every value lands in bucket
+    ceil(log_gamma(value)), so quantiles are accurate to RELATIVE_ACCURACY and two sketches
+    merge by adding their bucket counts.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+    MIN_VALUE = 0.001  # ms; anything smaller shares the lowest bucket
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        # JSON object keys are strings, so buckets are stored as str(index)
+        self.counts: Dict[str, int] = dict(counts or {})
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    @classmethod
+    def bucket(cls, value: float) -> int:
+        return math.ceil(math.log(max(value, cls.MIN_VALUE)) / cls.LOG_GAMMA)
+
+    @classmethod
+    def bucket_value(cls, index: int) -> float:
+        return 2 * cls.GAMMA ** index / (cls.GAMMA + 1)
+
+    def add(self, value: float):
+        key = str(self.bucket(value))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def merge(self, other: "LatencySketch"):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = len(self)
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(int(k) for k in self.counts):
+            seen += self.counts[str(index)]
+            if seen > rank:
+                return round(self.bucket_value(index), 2)
+        return None
+
+
+def bucket_start(at: datetime, resolution: int) -> datetime:
+    ts = at.timestamp()
+    return datetime.fromtimestamp(ts - ts % resolution, tz=timezone.utc)
+
+
+def rollup_rows(checks: Iterable[dict]) -> List[dict]:
+    """Aggregate analytics rows (server_id, status_code, latency_ms, created_at) into rollup rows."""
+    buckets: Dict[tuple, dict] = {}
+    for check in checks:
+        created_at = check["created_at"]
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        error = is_error(check["status_code"])
+        latency = check["latency_ms"]
+
+        for resolution in RESOLUTIONS:
+            key = (check["server_id"], resolution, bucket_start(created_at, resolution))
+            row = buckets.get(key)
+            if row is None:
+                row = buckets[key] = {
+                    "server_id": key[0],
+                    "resolution": resolution,
+                    "bucket_start": key[2],
+                    "check_count": 0,
+                    "error_count": 0,
+                    "latency_min": None,
+                    "latency_max": None,
+                    "latency_sum": 0.0,
+                    "latency_sketch": LatencySketch(),
+                }
+            row["check_count"] += 1
+            if error:
+                row["error_count"] += 1
+                continue
+            # latency stats only describe successful checks
+            row["latency_sum"] += latency
+            row["latency_min"] = latency if row["latency_min"] is None else min(row["latency_min"], latency)
+            row["latency_max"] = latency if row["latency_max"] is None else max(row["latency_max"], latency)
+            row["latency_sketch"].add(latency)
+
+    rows = list(buckets.values())
+    for row in rows:
+        row["latency_sketch"] = row["latency_sketch"].counts
+    return rows
+
+
+def upsert_statement():
+    """
+    INSERT ... ON CONFLICT that adds a batch's partial rollups onto existing buckets.
+    The merge happens in SQL, so concurrent writers never lose each other's counts.
+    """
+    stmt = pg_insert(ServerRollup)
+    table = ServerRollup.__table__
+    merged_sketch = text(
+        "(SELECT COALESCE(jsonb_object_agg(k, c), '{}'::jsonb) FROM ("
+        " SELECT k, sum(v::bigint) AS c FROM ("
+        "  SELECT key AS k, value AS v FROM jsonb_each_text(server_rollups.latency_sketch)"
+        "  UNION ALL"
+        "  SELECT key AS k, value AS v FROM jsonb_each_text(excluded.latency_sketch)"
+        " ) parts GROUP BY k) merged)"
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.server_id, table.c.resolution, table.c.bucket_start],
+        set_={
+            "check_count": table.c.check_count + stmt.excluded.check_count,
+            "error_count": table.c.error_count + stmt.excluded.error_count,
+            "latency_min": func.least(table.c.latency_min, stmt.excluded.latency_min),
+            "latency_max": func.greatest(table.c.latency_max, stmt.excluded.latency_max),
+            "latency_sum": table.c.latency_sum + stmt.excluded.latency_sum,
+            "latency_sketch": merged_sketch,
+        },
+    )
+
+
+def summarize(rollups: List[ServerRollup]) -> dict:
+    """Combine buckets into window totals plus a per-bucket series."""
+    checks = sum(r.check_count for r in rollups)
+    errors = sum(r.error_count for r in rollups)
+    successes = checks - errors
+    sketch = LatencySketch()
+    series = []
+    for r in rollups:
+        sketch.merge(LatencySketch(r.latency_sketch))
+        ok = r.check_count - r.error_count
+        series.append({
+            "bucket_start": r.bucket_start.isoformat(),
+            "checks": r.check_count,
+            "errors": r.error_count,
+            "avg_latency_ms": round(r.latency_sum / ok, 2) if ok else None,
+        })
+
+    mins = [r.latency_min for r in rollups if r.latency_min is not None]
+    maxs = [r.latency_max for r in rollups if r.latency_max is not None]
+    return {
+        "checks": checks,
+        "errors": errors,
+        "uptime_percent": round(100.0 * successes / checks, 3) if checks else None,
+        "latency_ms": {
+            "min": min(mins) if mins else None,
+            "max": max(maxs) if maxs else None,
+            "avg": round(sum(r.latency_sum for r in rollups) / successes, 2) if successes else None,
+            "p50": sketch.quantile(0.50),
+            "p95": sketch.quantile(0.95),
+            "p99": sketch.quantile(0.99),
+        },
+        "series": series,
+    }
+
+
+async def window_stats(db, server_id: int, window: str) -> dict:
+    length, resolution = WINDOWS[window]
+    since = bucket_start(datetime.now(timezone.utc) - timedelta(seconds=length), resolution)
+    rollups = (await db.scalars(
+        select(ServerRollup)
+        .where(
+            ServerRollup.server_id == server_id,
+            ServerRollup.resolution == resolution,
+            ServerRollup.bucket_start >= since,
+        )
+        .order_by(ServerRollup.bucket_start)
+    )).all()
+    return {"window": window, "resolution_seconds": resolution, **summarize(rollups)}
+
+
+async def prune_rollups():
+    """Minute buckets are only useful for short windows; drop them after ROLLUP_MINUTE_RETENTION_DAYS."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.ROLLUP_MINUTE_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ServerRollup).where(
+            ServerRollup.resolution == MINUTE,
+            ServerRollup.bucket_start < cutoff,
+        ))
+        await db.commit()
+
+
+async def rollup_maintenance_loop(is_leader: Callable[[], bool] = lambda: True):
+    while True:
+        try:
+            if is_leader():
+                await prune_rollups()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Rollup pruning failed: {e!r}")
+        await asyncio.sleep(3600)
+
+
+def backfill(server_id: Optional[int] = None, until: Optional[datetime] = None, chunk_size: int = 10000):
+    """
+    Rebuild rollups from raw analytics rows older than `until`.
+
+    By default `until` is the start of the current UTC day: buckets from today onwards are
+    still being written by the analytics writer, and rebuilding them underneath it would
+    double count. Pass until=now when the worker is stopped.
+    """
+    until = until or bucket_start(datetime.now(timezone.utc), DAY)
+    stmt = upsert_statement()
+
+    with engine.begin() as conn:
+        cleanup = delete(ServerRollup).where(ServerRollup.bucket_start < until)
+        if server_id is not None:
+            cleanup = cleanup.where(ServerRollup.server_id == server_id)
+        conn.execute(cleanup)
+
+        query = select(
+            ServerAnalytics.server_id,
+            ServerAnalytics.status_code,
+            ServerAnalytics.latency_ms,
+            ServerAnalytics.created_at,
+        ).where(ServerAnalytics.created_at < until, ServerAnalytics.created_at.is_not(None))
+        if server_id is not None:
+            query = query.where(ServerAnalytics.server_id == server_id)
+
+        total = 0
+        # server-side cursor, so memory stays flat however much history there is
+        result = conn.execute(query.execution_options(yield_per=chunk_size))
+        for chunk in result.mappings().partitions():
+            rows = rollup_rows(chunk)
+            conn.execute(stmt, rows)
+            total += len(chunk)
+        print(f"Backfilled rollups from {total} checks before {until.isoformat()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server analytics rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fill = sub.add_parser("backfill", help="rebuild rollups from raw server_analytics rows")
+    fill.add_argument("--server-id", type=int, default=None)
+    fill.add_argument("--until-now", action="store_true", help="include today's buckets (stop the worker first)")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        backfill(args.server_id, until=datetime.now(timezone.utc) if args.until_now else None)
@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import LATENESS_BUCKETS, Counter, Gauge, Histogram
+
+CHECKS_SCHEDULED = Counter("pulse_checks_scheduled_total", "Check ticks that came due")
+CHECKS_EXECUTED = Counter("pulse_checks_executed_total", "Checks that ran to completion or failed")
+CHECKS_MISSED = Counter("pulse_checks_missed_total", "Ticks skipped because the check was still running or too far behind")
+CHECK_FAILURES = Counter("pulse_check_failures_total", "Checks that raised, by exception type", ("type",))
+CHECK_LATENESS = Histogram("pulse_check_lateness_seconds", "How long after its due time a check was dispatched", buckets=LATENESS_BUCKETS)
+CHECKS_IN_FLIGHT = Gauge("pulse_checks_in_flight", "Checks queued or running")
+
+
+def jitter_fraction(server_id: int) -> float:
+    """Deterministic value in [0, 1) for a server, so phases are stable across restarts."""
+    return ((server_id * 2654435761) & 0xFFFFFFFF) / 2**32
+
+
+class _Entry:
+    __slots__ = ("interval", "due", "generation")
+
+    def __init__(self, interval: float, due: float, generation: int):
+        self.interval = interval
+        self.due = due
+        self.generation = generation
+
+
+class CheckScheduler:
+    """
+    Single fixed-rate scheduler for every monitor.
+
+    Due times live in a min-heap, and each tick is scheduled from the previous *due* time
+    (not from when the check finished), so the period doesn't drift with latency or DB time.
+    Due checks are handed to a bounded pool of worker tasks. A tick that fires while the
+    previous check of the same server is still running, or that is already a full interval
+    behind, is counted as missed and skipped instead of piling up.
+    """
+
+    def __init__(
+        self,
+        check: Callable[[int], Awaitable[None]],
+        concurrency: int = 100,
+        jitter: float = 1.0,
+        late_threshold: float = 1.0,
+        report_every: float = 60.0,
+    ):
+        self._check = check
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.late_threshold = late_threshold
+        self.report_every = report_every
+
+        self._heap: List[Tuple[float, int, int]] = []  # (due, generation, server_id)
+        self._entries: Dict[int, _Entry] = {}
+        self._generation = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        self._in_flight = set()
+        self._wakeup = asyncio.Event()
+
+        self.stats = {
+            "scheduled": 0,
+            "executed": 0,
+            "failed": 0,
+            "late": 0,
+            "missed": 0,
+            "max_lateness": 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, server_id: int):
+        return server_id in self._entries
+
+    def schedule(self, server_id: int, interval: float, first_due: Optional[float] = None, phase_key: Optional[int] = None):
+        """
+        Add a monitor or update its interval. New monitors start at a deterministic phase
+        within their interval unless first_due (a loop.time() value) is given. The phase
+        comes from phase_key when given (monitors sharing a key fire together), else the id.
+        """
+        now = asyncio.get_running_loop().time()
+        entry = self._entries.get(server_id)
+
+        if entry is not None:
+            if entry.interval == interval and first_due is None:
+                return
+            due = first_due if first_due is not None else min(entry.due, now + interval)
+        elif first_due is not None:
+            due = first_due
+        else:
+            due = now + jitter_fraction(server_id if phase_key is None else phase_key) * interval * self.jitter
+
+        self._generation += 1
+        self._entries[server_id] = _Entry(interval, due, self._generation)
+        heapq.heappush(self._heap, (due, self._generation, server_id))
+        self._wakeup.set()
+
+    def unschedule(self, server_id: int):
+        # Heap items for removed servers are skipped lazily when they come up
+        self._entries.pop(server_id, None)
+
+    def server_ids(self):
+        return set(self._entries)
+
+    def next_due(self, server_id: int) -> Optional[float]:
+        entry = self._entries.get(server_id)
+        return entry.due if entry else None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        next_report = loop.time() + self.report_every
+        reported = (0, 0)
+        try:
+            while True:
+                now = loop.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due, generation, server_id = heapq.heappop(self._heap)
+                    entry = self._entries.get(server_id)
+                    if entry is None or entry.generation != generation:
+                        continue  # removed or rescheduled since this item was pushed
+                    await self._dispatch(server_id, entry, due, now)
+                    now = loop.time()
+
+                if now >= next_report:
+                    current = (self.stats["late"], self.stats["missed"])
+                    if current != reported:
+                        print(
+                            f"Scheduler: {current[0] - reported[0]} late and {current[1] - reported[1]} missed ticks "
+                            f"in the last {self.report_every:.0f}s (max lateness {self.stats['max_lateness']:.2f}s)"
+                        )
+                        reported = current
+                    next_report = now + self.report_every
+
+                timeout = next_report - now
+                if self._heap:
+                    timeout = min(timeout, self._heap[0][0] - now)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _dispatch(self, server_id: int, entry: _Entry, due: float, now: float):
+        stats = self.stats
+        stats["scheduled"] += 1
+        CHECKS_SCHEDULED.inc()
+
+        lateness = now - due
+        CHECK_LATENESS.observe(max(lateness, 0.0))
+        if lateness > self.late_threshold:
+            stats["late"] += 1
+        if lateness > stats["max_lateness"]:
+            stats["max_lateness"] = lateness
+
+        # Fixed-rate: the next tick is relative to this tick's due time. If we are so far
+        # behind that whole ticks have already passed, skip them instead of bursting.
+        next_due = due + entry.interval
+        if next_due <= now:
+            skipped = int((now - next_due) // entry.interval) + 1
+            stats["missed"] += skipped
+            CHECKS_MISSED.inc(skipped)
+            next_due += skipped * entry.interval
+        entry.due = next_due
+        heapq.heappush(self._heap, (next_due, entry.generation, server_id))
+
+        if server_id in self._in_flight:
+            stats["missed"] += 1
+            CHECKS_MISSED.inc()
+            return
+        self._in_flight.add(server_id)
+        CHECKS_IN_FLIGHT.inc()
+        # Blocks when every worker is busy and the queue is full, which shows up as lateness
+        await self._queue.put(server_id)
+
+    async def _worker(self):
+        while True:
+            server_id = await self._queue.get()
+            try:
+                await self._check(server_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                CHECK_FAILURES.labels(type(e).__name__).inc()
+                print(f"Check for server {server_id} failed: {e!r}")
+            finally:
+                self._in_flight.discard(server_id)
+                CHECKS_IN_FLIGHT.dec()
+                self.stats["executed"] += 1
+                CHECKS_EXECUTED.inc()
@@ -0,0 +1,105 @@
+"""
+Shards monitors across the running monitoring workers.
+
+Every worker heartbeats a row in monitor_workers and reads back the live membership; rows
+that miss WORKER_TTL_SECONDS of heartbeats are treated as dead and removed. Each monitor is
+assigned (by its normalized URL, see servers.coalesce) with rendezvous (highest random weight) hashing over that membership, so all
+workers agree on the owner without talking to each other, and a join or a death only moves
+the monitors that hash to the worker concerned. The worker that wins the hash of "leader"
+runs the maintenance jobs.
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import uuid
+from datetime import timedelta
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import AsyncSessionLocal
+from servers.models import MonitorWorker
+
+LEADER_KEY = "leader"
+
+
+def _weight(worker_id: str, key) -> int:
+    digest = hashlib.blake2b(f"{worker_id}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def rendezvous_owner(workers, key) -> Optional[str]:
+    return max(workers, key=lambda w: _weight(w, key)) if workers else None
+
+
+class ShardCoordinator:
+    def __init__(self, worker_id: Optional[str] = None, heartbeat_interval: float = 5.0, ttl: float = 15.0):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl = ttl
+        self.members: Tuple[str, ...] = ()
+        self._listeners: List[Callable[[], None]] = []
+        self._last_heartbeat: Optional[float] = None
+
+    def owns(self, key) -> bool:
+        return rendezvous_owner(self.members, key) == self.worker_id
+
+    def is_leader(self) -> bool:
+        return rendezvous_owner(self.members, LEADER_KEY) == self.worker_id
+
+    def subscribe(self, listener: Callable[[], None]):
+        """listener() runs whenever membership, and so ownership, changes."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _set_members(self, members: Tuple[str, ...]):
+        if members == self.members:
+            return
+        self.members = members
+        print(f"Worker {self.worker_id}: {len(members)} live worker(s), rebalancing monitors")
+        for listener in list(self._listeners):
+            listener()
+
+    async def heartbeat(self):
+        """Refresh our row, expire dead workers and reload the membership, in one transaction."""
+        async with AsyncSessionLocal() as db:
+            stmt = pg_insert(MonitorWorker).values(worker_id=self.worker_id, hostname=socket.gethostname())
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[MonitorWorker.worker_id],
+                set_={"heartbeat_at": func.now()},
+            ))
+            await db.execute(delete(MonitorWorker).where(
+                MonitorWorker.heartbeat_at < func.now() - timedelta(seconds=self.ttl)
+            ))
+            members = (await db.scalars(select(MonitorWorker.worker_id).order_by(MonitorWorker.worker_id))).all()
+            await db.commit()
+        self._last_heartbeat = asyncio.get_running_loop().time()
+        self._set_members(tuple(members))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Worker heartbeat failed: {e!r}")
+                # past the TTL the others have taken our monitors over; stop checking them
+                if self._last_heartbeat is None or asyncio.get_running_loop().time() - self._last_heartbeat > self.ttl:
+                    self._set_members(())
+
+    async def leave(self):
+        """Remove our row so the remaining workers pick up our monitors on their next heartbeat."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(MonitorWorker).where(MonitorWorker.worker_id == self.worker_id))
+                await db.commit()
+        except Exception as e:
+            print(f"Could not deregister worker {self.worker_id}: {e!r}")
+        self.members = ()
@@ -1,25 +1,312 @@
+import asyncio
+import json
+from collections import deque
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from app.config import settings
+from app.metrics import Callback
+from servers.broadcast import BroadcastBackend, create_backend
+
+
+class ClientConnection:
+    """
+    One browser socket with its own bounded outbound queue and writer task.
+
+    When a client can't keep up, the oldest pending message is dropped: every message is a
+    full status snapshot, so the newest one supersedes what it replaces. A send that fails
+    or takes longer than send_timeout marks the connection dead and it gets evicted.
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, send_timeout: float):
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self._queue: Deque[str] = deque(maxlen=max_queue)
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_dead: Callable[["ClientConnection"], None]):
+        self._task = asyncio.create_task(self._writer(on_dead))
+
+    def send(self, text: str) -> bool:
+        """Queue a message; returns True when an older one had to be dropped for it."""
+        dropped = len(self._queue) == self._queue.maxlen
+        self._queue.append(text)
+        self._ready.set()
+        return dropped
+
+    async def _writer(self, on_dead):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    text = self._queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # dead or too slow: let the manager evict us
+            on_dead(self)
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class MultiplexedConnection:
+    """
+    One dashboard socket watching any number of servers (/servers/ws/dashboard).
+
+    Results are not queued per message: the latest result of each server replaces the
+    previous one in `_pending`, and every `interval` seconds the writer sends one frame
+    with, per server, only the fields that differ from what this socket was last sent.
+    Memory per socket is bounded by the number of servers it watches, however slow it is.
+    Replies to subscribe requests go out ahead of the next frame.
+    """
+
+    def __init__(self, websocket: WebSocket, interval: float, send_timeout: float):
+        self.websocket = websocket
+        self.interval = interval
+        self.send_timeout = send_timeout
+        self.server_ids: Set[int] = set()
+        self._pending: Dict[int, dict] = {}
+        self._sent: Dict[int, dict] = {}
+        self._control: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_dead: Callable[["MultiplexedConnection"], None]):
+        self._task = asyncio.create_task(self._writer(on_dead))
+
+    def update(self, server_id: int, message: dict):
+        # message is shared with every other socket watching the server: read, never modify
+        self._pending[server_id] = message
+        self._ready.set()
+
+    def reply(self, message: dict):
+        self._control.append(json.dumps(message))
+        self._ready.set()
+
+    def forget(self, server_ids: Iterable[int]):
+        for server_id in server_ids:
+            self._pending.pop(server_id, None)
+            self._sent.pop(server_id, None)
+
+    def _frame(self) -> Optional[str]:
+        updates = {}
+        for server_id, message in self._pending.items():
+            sent = self._sent.setdefault(server_id, {})
+            changed = {k: v for k, v in message.items() if sent.get(k, ...) != v}
+            if changed:
+                sent.update(changed)
+                updates[server_id] = changed
+        self._pending.clear()
+        return json.dumps({"type": "updates", "updates": updates}) if updates else None
+
+    async def _writer(self, on_dead):
+        try:
+            while True:
+                await self._ready.wait()
+                if not self._control:
+                    # give results that arrive together a chance to share the frame
+                    await asyncio.sleep(self.interval)
+                self._ready.clear()
+                while self._control:
+                    await asyncio.wait_for(self.websocket.send_text(self._control.popleft()), timeout=self.send_timeout)
+                frame = self._frame()
+                if frame is not None:
+                    await asyncio.wait_for(self.websocket.send_text(frame), timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            on_dead(self)
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class _Subscription:
+    """A MultiplexedConnection's entry among one server's viewers."""
+
+    __slots__ = ("connection", "server_id")
+
+    def __init__(self, connection: MultiplexedConnection, server_id: int):
+        self.connection = connection
+        self.server_id = server_id
+
+    def stop(self):
+        pass
+
 
 class ConnectionManager:
-    def __init__(self):
-        # Dictionary mapping server_id to a list of active WebSockets
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+    """
+    Tracks the browsers watching each server and fans results out to them.
+
+    broadcast_to_server serializes the result once and hands it to the broadcast backend,
+    which carries it to every process with viewers of that server (possibly this one). On
+    arrival the text only goes into an outbox, so the pinger pays the same tiny cost no
+    matter how many viewers there are. A single fan-out task drops the text into every
+    local viewer's queue; per-connection writer tasks do the actual sends. Dashboard sockets
+    (MultiplexedConnection) take part once per server they subscribed to.
+    """
+
+    def __init__(self, max_queue: int = 32, send_timeout: float = 5.0, batch_interval: float = 0.25, backend: Optional[BroadcastBackend] = None):
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.batch_interval = batch_interval
+        # Dictionary mapping server_id to the active connections watching it
+        # (multiplexed sockets appear here as a _Subscription per server they watch)
+        self.active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = {}
+        self.multiplexed: Set[MultiplexedConnection] = set()
+        self._outbox: Deque[Tuple[int, str]] = deque()
+        self._pending = asyncio.Event()
+        self._fanout_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()  # closes of evicted sockets; the loop only keeps weak references
+        self.backend = backend or create_backend()
+        self.backend.bind(self._deliver)
+
+        self.stats = {"dropped": 0, "evicted": 0}
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def connection_count(self) -> int:
+        single = sum(1 for clients in self.active_connections.values() for c in clients.values() if isinstance(c, ClientConnection))
+        return single + len(self.multiplexed)
 
     async def connect(self, websocket: WebSocket, server_id: int):
         await websocket.accept()
-        if server_id not in self.active_connections:
-            self.active_connections[server_id] = []
-        self.active_connections[server_id].append(websocket)
+        client = ClientConnection(websocket, self.max_queue, self.send_timeout)
+        client.start(lambda c: self._evict(c, server_id))
+        self.active_connections.setdefault(server_id, {})[websocket] = client
+        # one backend subscription per connection; the backend listens while any are open
+        await self.backend.subscribe(server_id)
 
     def disconnect(self, websocket: WebSocket, server_id: int):
-        if server_id in self.active_connections:
-            self.active_connections[server_id].remove(websocket)
+        clients = self.active_connections.get(server_id)
+        if not clients:
+            return
+        client = clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+            self.backend.unsubscribe(server_id)
+        if not clients:
+            del self.active_connections[server_id]
+
+    def _evict(self, client: ClientConnection, server_id: int):
+        self.stats["evicted"] += 1
+        self.disconnect(client.websocket, server_id)
+        self._spawn(self._close_quietly(client.websocket))
+
+    def _spawn(self, coro: Awaitable):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def connect_multiplexed(self, websocket: WebSocket) -> MultiplexedConnection:
+        await websocket.accept()
+        connection = MultiplexedConnection(websocket, self.batch_interval, self.send_timeout)
+        connection.start(self._evict_multiplexed)
+        self.multiplexed.add(connection)
+        return connection
+
+    async def subscribe(self, connection: MultiplexedConnection, server_ids: Iterable[int]):
+        for server_id in server_ids:
+            # evicted (possibly while awaiting the backend below): nothing would clean these up
+            if connection not in self.multiplexed:
+                return
+            if server_id in connection.server_ids:
+                continue
+            connection.server_ids.add(server_id)
+            self.active_connections.setdefault(server_id, {})[connection.websocket] = _Subscription(connection, server_id)
+            await self.backend.subscribe(server_id)
+
+    def unsubscribe(self, connection: MultiplexedConnection, server_ids: Iterable[int]):
+        removed: List[int] = [server_id for server_id in server_ids if server_id in connection.server_ids]
+        for server_id in removed:
+            connection.server_ids.discard(server_id)
+            self.disconnect(connection.websocket, server_id)
+        connection.forget(removed)
+
+    def disconnect_multiplexed(self, connection: MultiplexedConnection):
+        if connection not in self.multiplexed:
+            return
+        self.unsubscribe(connection, list(connection.server_ids))
+        connection.stop()
+        self.multiplexed.discard(connection)
+
+    def _evict_multiplexed(self, connection: MultiplexedConnection):
+        self.stats["evicted"] += 1
+        self.disconnect_multiplexed(connection)
+        self._spawn(self._close_quietly(connection.websocket))
 
     async def broadcast_to_server(self, server_id: int, message: dict):
-        """Sends a message only to clients watching a specific server."""
-        if server_id in self.active_connections:
-            for connection in self.active_connections[server_id]:
-                await connection.send_json(message)
+        """Publishes a result to clients watching a specific server, in any process."""
+        self.backend.publish(server_id, json.dumps(message))  # once per broadcast, not once per client
+
+    def _deliver(self, server_id: int, text: str):
+        # called by the backend for servers this process subscribed to
+        if server_id not in self.active_connections:
+            return
+        self._outbox.append((server_id, text))
+        self._pending.set()
+        if self._fanout_task is None or self._fanout_task.done():
+            self._fanout_task = asyncio.create_task(self._fanout())
+
+    async def _fanout(self):
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            while self._outbox:
+                server_id, text = self._outbox.popleft()
+                clients = self.active_connections.get(server_id)
+                if not clients:
+                    continue
+                message = None
+                for client in list(clients.values()):
+                    if isinstance(client, _Subscription):
+                        if message is None:
+                            message = json.loads(text)  # once per result, shared by all dashboard sockets
+                        client.connection.update(server_id, message)
+                    elif client.send(text):
+                        self.stats["dropped"] += 1
+                # let writers drain between messages so a burst doesn't overflow fast clients
+                await asyncio.sleep(0)
+
+
+manager = ConnectionManager(
+    max_queue=settings.WS_SEND_QUEUE_SIZE,
+    send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+    batch_interval=settings.WS_BATCH_MILLISECONDS / 1000,
+)
 
-manager = ConnectionManager()
+Callback("pulse_websocket_connections", "Open live-update WebSockets", "gauge", manager.connection_count)
+Callback(
+    "pulse_websocket_messages_dropped_total",
+    "Live updates dropped: full client queues, broadcast backend drops, evicted slow clients",
+    "counter",
+    lambda: {
+        ("client_queue",): manager.stats["dropped"],
+        ("backend",): manager.backend.stats["dropped"],
+        ("evicted",): manager.stats["evicted"],
+    },
+    ("reason",),
+)
+Callback(
+    "pulse_broadcast_messages_total",
+    "Live updates through the broadcast backend",
+    "counter",
+    lambda: {("published",): manager.backend.stats["published"], ("delivered",): manager.backend.stats["delivered"]},
+    ("direction",),
+)
@@ -1,71 +1,208 @@
-# app/core/worker.py
+"""
+Monitoring worker. Runs embedded in the web process (EMBEDDED_WORKER=true) or on its own:
+
+    python -m servers.worker
+
+Any number of workers can run at once; the ShardCoordinator splits the monitors between them.
+"""
 import asyncio
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from servers.models import UserServer
-from servers.pinger import perform_ping 
+import signal
+import time
+from typing import Optional
+from app.config import settings
+from app import metrics
+from servers.adaptive import AdaptiveTracker
+from servers.alerts import alert_dispatcher
+from servers.analytics_writer import analytics_writer
+from servers.coalesce import normalize_url, phase_key
+from servers.http_client import close_http_client, start_http_client
+from servers.incidents import status_tracker
+from servers.partitions import partition_maintenance_loop
+from servers.pinger import perform_ping
+from servers.recent import recent_checks
+from servers.registry import registry
+from servers.rollups import rollup_maintenance_loop
+from servers.scheduler import CheckScheduler, jitter_fraction
+from servers.sharding import ShardCoordinator
+from servers.websocket_manager import manager
+
+
+async def check_server(server_id, adaptive: Optional[AdaptiveTracker] = None) -> Optional[float]:
+    """Check a monitor; for adaptive monitors, returns the interval to use from now on."""
+    # the registry always holds the latest url/interval, no query needed per ping
+    server = registry.get(server_id)
+    if server is None:
+        return None
+    if adaptive is None or not server.adaptive:
+        await perform_ping(server)
+        return None
+    status = await perform_ping(server, timeout=adaptive.timeout_for(server_id))
+    return adaptive.record(server, status == 200)
+
 
 async def monitoring_loop():
     """
-    Create a dedicated asyncio.Task per server so each one runs at its own interval_seconds.
-    The main loop refreshes the server list periodically, starting monitors for new servers
-    and cancelling monitors for removed servers.
+    Run one CheckScheduler over this worker's share of the monitors.
+
+    The registry is loaded once and then follows change events, which become scheduler
+    updates: new monitors are checked right away, interval changes are rescheduled and
+    deleted monitors are dropped. When workers join or leave, monitors that changed owner
+    are scheduled or dropped. check_server reads the spec from the registry on every tick,
+    so a URL edit only matters when it moves the monitor to another worker.
+
+    Monitors are sharded by URL and monitors of one URL share a phase, so duplicates
+    coalesce into one probe (servers.coalesce). On startup, monitors with history resume
+    from their last recorded check (resume_due) instead of all firing at once. Adaptive
+    monitors are rescheduled after every check with the interval AdaptiveTracker picks.
     """
-    tasks = {}  # server_id -> asyncio.Task
+    adaptive = AdaptiveTracker(
+        stable_checks=settings.ADAPTIVE_STABLE_CHECKS,
+        down_timeout=settings.PING_DOWN_TIMEOUT_SECONDS,
+        full_probe_every=settings.ADAPTIVE_FULL_PROBE_EVERY,
+    )
 
-    async def monitor_server(server_id):
-        while True:
-            # open a fresh session for each ping
-            with SessionLocal() as db:
-                try:
-                    server = db.query(UserServer).filter(UserServer.id == server_id).first()
-                    if server is None:
-                        return
+    async def check(server_id):
+        interval = await check_server(server_id, adaptive)
+        if interval is not None and server_id in scheduler:
+            scheduler.schedule(server_id, interval)
 
-                    # perform the ping with a fresh session and server instance
-                    await perform_ping(db, server)
+    scheduler = CheckScheduler(
+        check,
+        concurrency=settings.WORKER_CONCURRENCY,
+        jitter=settings.SCHEDULER_JITTER,
+        late_threshold=settings.SCHEDULER_LATE_THRESHOLD_SECONDS,
+    )
+    coordinator = ShardCoordinator(
+        settings.WORKER_ID or None,
+        heartbeat_interval=settings.WORKER_HEARTBEAT_SECONDS,
+        ttl=settings.WORKER_TTL_SECONDS,
+    )
+    loop = asyncio.get_running_loop()
 
-                    # read interval (fallback to 60s if missing/invalid)
-                    interval = getattr(server, "interval_seconds", None) or 60
-                except asyncio.CancelledError:
-                    raise
-                except Exception as e:
-                    interval = 60
+    def owned(spec) -> bool:
+        # sharded by URL, so monitors of the same URL land on one worker and share probes
+        return coordinator.owns(normalize_url(spec.server_url))
 
-            await asyncio.sleep(interval)
+    def on_change(action, server_id, spec):
+        # edits start adaptive monitors over from their configured interval
+        adaptive.discard(server_id)
+        if action == "delete":
+            scheduler.unschedule(server_id)
+            recent_checks.discard(server_id)
+            status_tracker.discard(server_id)
+        elif not owned(spec):
+            # a URL edit can move the monitor to another worker
+            if server_id in scheduler:
+                scheduler.unschedule(server_id)
+                recent_checks.discard(server_id)
+                status_tracker.discard(server_id)
+        elif server_id in scheduler:
+            scheduler.schedule(server_id, spec.interval_seconds)
+        else:
+            scheduler.schedule(server_id, spec.interval_seconds, first_due=loop.time())
 
-    try:
-        while True:
-            # refresh server list
-            with SessionLocal() as db:
-                try:
-                    servers = db.query(UserServer).all()
-                except Exception as e:
-                    servers = []
-
-            current_ids = {s.id for s in servers}
-
-            # start monitors for new servers
-            for s in servers:
-                if s.id not in tasks:
-                    tasks[s.id] = asyncio.create_task(monitor_server(s.id))
-
-            # cancel monitors for removed servers
-            removed = [sid for sid in tasks.keys() if sid not in current_ids]
-            for sid in removed:
-                task = tasks.pop(sid)
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    pass
-
-            # main loop refresh interval: small so new/removed servers are picked up quickly
+    def resume_due(spec) -> Optional[float]:
+        """
+        When the monitor's next check falls due going by its last recorded one (loop time),
+        or None without history. Monitors that are already overdue are spread over
+        STARTUP_RAMP_SECONDS by their URL phase rather than all firing at once.
+        """
+        last = recent_checks.last_checked(spec.id)
+        if last is None:
+            return None
+        now = loop.time()
+        due = now + last + spec.interval_seconds - time.time()
+        if due > now:
+            return due
+        return now + jitter_fraction(phase_key(spec.server_url)) * settings.STARTUP_RAMP_SECONDS
+
+    def on_rebalance(resume: bool = False):
+        # taken-over monitors keep their usual phase rather than all firing at once;
+        # the phase follows the URL, so duplicate monitors share one probe
+        for spec in registry.monitors.values():
+            mine = owned(spec)
+            if mine and spec.id not in scheduler:
+                first_due = resume_due(spec) if resume else None
+                scheduler.schedule(spec.id, spec.interval_seconds, first_due=first_due, phase_key=phase_key(spec.server_url))
+            elif not mine and spec.id in scheduler:
+                scheduler.unschedule(spec.id)
+                recent_checks.discard(spec.id)
+                adaptive.discard(spec.id)
+                # the new owner writes its transitions; if it comes back, resync from its first check
+                status_tracker.discard(spec.id)
+
+    # initial load; monitors resume from their last check or, without history, are spread
+    # over their interval, so they don't all fire at once
+    while True:
+        try:
+            await registry.load()
+            await coordinator.heartbeat()
+            # before any check runs, so warmed buffers never overwrite fresh results
+            await recent_checks.warm([spec.id for spec in registry.monitors.values() if owned(spec)])
+            status_tracker.warm({
+                spec.id: last[0].status_code
+                for spec in registry.monitors.values()
+                if (last := recent_checks.latest(spec.id, 1))
+            })
+            break
+        except Exception as e:
+            print(f"Could not load monitors, retrying: {e!r}")
             await asyncio.sleep(5)
-    except asyncio.CancelledError:
-        # cancel all child tasks on shutdown
-        for t in tasks.values():
+    on_rebalance(resume=True)
+    registry.subscribe(on_change)
+    coordinator.subscribe(on_rebalance)
+    print(f"Worker {coordinator.worker_id}: checking {len(scheduler)} of {len(registry.monitors)} monitors")
+
+    tasks = [
+        asyncio.create_task(scheduler.run()),
+        asyncio.create_task(registry.run()),
+        asyncio.create_task(coordinator.run()),
+        asyncio.create_task(partition_maintenance_loop(coordinator.is_leader)),
+        asyncio.create_task(rollup_maintenance_loop(coordinator.is_leader)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        registry.unsubscribe(on_change)
+        coordinator.unsubscribe(on_rebalance)
+        for t in tasks:
             t.cancel()
-        raise
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await coordinator.leave()
+
+
+async def main():
+    await start_http_client()
+    analytics_writer.start()
+    alert_dispatcher.start()
+    # results are published to viewers on the web processes through the broadcast backend
+    await manager.start()
+
+    metrics_server = None
+    if settings.WORKER_METRICS_PORT:
+        metrics_server = await metrics.serve("0.0.0.0", settings.WORKER_METRICS_PORT)
+
+    worker_task = asyncio.create_task(monitoring_loop())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker_task.cancel)
+    try:
+        await worker_task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        # flush queued analytics before the process exits
+        await analytics_writer.stop()
+        await alert_dispatcher.stop()
+        await manager.stop()
+        await close_http_client()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+if __name__ == "__main__":
+    from users import models  # noqa: F401  registers the users table for the servers foreign keys
+
+    if settings.BROADCAST_BACKEND == "memory":
+        print("BROADCAST_BACKEND=memory: live updates from this worker won't reach the web processes")
+    asyncio.run(main())
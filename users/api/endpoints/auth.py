@@ -1,12 +1,13 @@
 from fastapi import Depends, HTTPException, APIRouter, status, Request, Form
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from users import models
-from app.database import get_db
-from typing import List
+from app.database import get_async_db
 from app.config import templates
-from argon2 import PasswordHasher
-from app.security import create_access_token
+from app.passwords import HashingPoolBusy, password_pool
+from app.security import token_from_cookie, create_access_token, user_cache
 
 
 router = APIRouter(
@@ -15,33 +16,44 @@ router = APIRouter(
 )
 
 
+def _busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register")
 async def register_user(
     request: Request,
     name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 1. Validation
     if len(password) < 6:
         return templates.TemplateResponse("signup.html", {"request": request, "error": "Password too short!"})
     
     # 2. Check for existing user 
-    existing_user = db.query(models.User).filter(models.User.email == email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == email))
     if existing_user:
         return templates.TemplateResponse("signup.html", {"request": request, "error": "Email already registered!"})
 
     # 3. Hash and Save
-    hashed_password = PasswordHasher().hash(password)
+    try:
+        hashed_password = await password_pool.hash(password)
+    except HashingPoolBusy:
+        raise _busy()
     db_user = models.User(name=name, email=email, password=hashed_password)
     
     try:
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return templates.TemplateResponse("signup.html", {"request": request, "error": "Database error. Try again."})
 
     return RedirectResponse(url="/signin", status_code=status.HTTP_303_SEE_OTHER)
@@ -52,21 +64,37 @@ async def login_user(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 1. Fetch user by email
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         return templates.TemplateResponse("signin.html", {"request": request, "error": "Invalid credentials!"})
     
     # 2. Verify password
     try:
-        PasswordHasher().verify(user.password, password)
-    except:
+        valid = await password_pool.verify(user.password, password)
+    except HashingPoolBusy:
+        raise _busy()
+    if not valid:
         return templates.TemplateResponse("signin.html", {"request": request, "error": "Invalid credentials!"})
+
+    # read before a failed rehash rolls back and expires the user
+    claims = {"sub": user.email, "uid": user.id}
+
+    # upgrade hashes made with older Argon2 parameters while we have the plain password
+    if password_pool.needs_rehash(user.password):
+        try:
+            user.password = await password_pool.hash(password)
+            await db.commit()
+        except HashingPoolBusy:
+            pass  # try again on a later login
+        except SQLAlchemyError as e:
+            await db.rollback()
+            print(f"Could not store rehashed password for user {claims['uid']}: {e!r}")
     
     # 3. Create JWT token
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=claims)
 
     # 4. Successful login (Setting cookie and redirecting)
     response = RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
@@ -75,7 +103,10 @@ async def login_user(
 
 
 @router.get("/logout")
-async def logout_user():
+async def logout_user(request: Request):
+    token = token_from_cookie(request)
+    if token:
+        user_cache.invalidate_token(token)
     response = RedirectResponse(url="/signin", status_code=status.HTTP_303_SEE_OTHER)
     response.delete_cookie(key="access_token")
     return response